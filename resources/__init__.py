@@ -1,2 +1,4 @@
-import io
-# import utils
\ No newline at end of file
+from .utils.lazy import lazy_exports
+
+# subpackages are imported on first access, e.g. `resources.processing.DataframeTransformer`
+__getattr__, __dir__ = lazy_exports(__name__, submodules=('io', 'modeling', 'plotting', 'processing', 'utils'))
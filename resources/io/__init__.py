@@ -1 +1,7 @@
-from .api_manager import ApiManager, make_config
\ No newline at end of file
+from resources.utils.lazy import lazy_exports
+
+__all__ = ['ApiManager', 'make_config', 'AsyncApiManager', 'fetch_all']
+__getattr__, __dir__ = lazy_exports(__name__, {'ApiManager': 'api_manager',
+                                               'make_config': 'api_manager',
+                                               'AsyncApiManager': 'async_api_manager',
+                                               'fetch_all': 'async_api_manager'})
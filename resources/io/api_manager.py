@@ -2,14 +2,28 @@
 
 import requests
 import hashlib
+import time
+import json
 import yaml
 import re
 import os
 import datetime
 import dateutil.tz as tz
 from string import punctuation
+import numpy as np
+import pandas as pd
 from pandas import read_csv
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+from .columnar import columnar_available, read_columnar, selects_by_name, write_columnar
+
+CHUNK_SIZE = 64 * 1024
+
+# streamed downloads ask for the raw content: Range offsets and Content-Length
+# then count the same bytes that are written to disk (not a gzip encoding)
+STREAM_HEADERS = {'Accept-Encoding': 'identity'}
 
 class HelperApiParser():
     """This class is intended to provide private methods for parsing ApiManager
@@ -53,61 +67,273 @@ class HelperApiRetriever():
         output_formatter = {False: str,
                             True: lambda data: read_csv(data, **kwargs)}
 
+        # explicit *usecols* (e.g. from a lazy pipeline) take precedence over config fields
         if as_dataframe and instance.endpoints[endpoint_name].get('fields'):
-            kwargs.update({'usecols': instance.endpoints[endpoint_name]['fields']})
+            kwargs.setdefault('usecols', instance.endpoints[endpoint_name]['fields'])
 
         if hasattr(instance, '_sha1') or (instance.last != ''):
+            # typed columnar copy, only valid when no other parsing option is asked for
+            columnar = instance.endpoints[endpoint_name].get('columnar')
+            if (as_dataframe and columnar and not set(kwargs) - {'usecols'}
+                    and selects_by_name(kwargs.get('usecols')) and os.path.isfile(columnar)):
+                return read_columnar(columnar, kwargs.get('usecols'))
+
             output = instance.endpoints[endpoint_name]['data']
             return output_formatter[as_dataframe](output)
         else:
             return None
 
+class HelperFetchReport():
+    """This class collects the per-endpoint results of an `ApiManager.fetch` call
+    and prints a progress line as each endpoint completes."""
+
+    def __init__(self, api_name, n_endpoints):
+        self.api_name = api_name
+        self.n_endpoints = n_endpoints
+        self.records = {}
+
+    def add(self, endpoint_name, record):
+        self.records[endpoint_name] = record
+        i = len(self.records)
+        print(f'[{i}/{self.n_endpoints}] Endpoint: {endpoint_name.upper()} -> {self._format_record(record)}')
+
+    @property
+    def failed(self):
+        return [name for name, record in self.records.items() if record['error'] is not None]
+
+    @property
+    def not_modified(self):
+        return [name for name, record in self.records.items() if record['status'] == 304]
+
+    def summary(self):
+        total_bytes = sum(record['bytes'] for record in self.records.values())
+        n_ok = len(self.records) - len(self.failed)
+        return (f'{n_ok}/{self.n_endpoints} endpoints fetched from {self.api_name.upper()}, '
+                f'{len(self.not_modified)} not modified ({total_bytes / 1024:.1f} kB)')
+
+    def __iter__(self):
+        return iter(self.records.items())
+
+    def __getitem__(self, endpoint_name):
+        return self.records[endpoint_name]
+
+    @staticmethod
+    def _format_record(record):
+        if record['error'] is not None:
+            return f"FAILED ({record['error']})"
+        if record['status'] == 304:
+            return f"304 Not Modified ({record['elapsed']:.2f}s)"
+        return f"{record['status']} ({record['bytes'] / 1024:.1f} kB in {record['elapsed']:.2f}s)"
+
+class HelperApiManifest():
+    """This class persists per-endpoint cache validators in a JSON manifest so
+    that later fetches can issue conditional requests.
+
+    Each entry stores the ETag, Last-Modified, SHA1 content hash, size and fetch
+    time of the last downloaded version of an endpoint."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = self._load()
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return {}
+        with open(self.path) as file:
+            return json.load(file)
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(self.entries, file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def get(self, endpoint_name):
+        return self.entries.get(endpoint_name, {})
+
+    def update(self, endpoint_name, **fields):
+        self.entries.setdefault(endpoint_name, {}).update(fields)
+
+    def conditional_headers(self, endpoint_name, file_path):
+        """Return the validator headers for *endpoint_name*, as long as the file
+        they describe is still on disk."""
+
+        entry = self.get(endpoint_name)
+        if not entry or not os.path.isfile(file_path) or os.path.getsize(file_path) != entry.get('size'):
+            return {}
+
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
 class ApiManager(HelperApiParser):
-    def __init__(self, path, base_dir, monitor_api=False):
+    def __init__(self, path, base_dir, monitor_api=False, max_workers=1, columnar=True):
         HelperApiParser.__init__(self, monitor_api=monitor_api)
         assert os.path.isdir(base_dir)
+        assert max_workers >= 1
         self.base_directory = os.path.abspath(base_dir)
+        self.max_workers = max_workers
+        self.columnar = columnar and columnar_available()
         
         self._parse_config_file(path)
         self.retrieve = HelperApiRetriever(self)
         self.last = '' 
 
-    def fetch(self, force=False):
+    def __setstate__(self, state):
+        # instances pickled before these options existed (e.g. api-covid.pkl)
+        self.__dict__.update(state)
+        self.__dict__.setdefault('max_workers', 1)
+        self.__dict__.setdefault('columnar', columnar_available())
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.base_directory, f'{self.name}.manifest.json')
+
+    def fetch(self, force=False, max_workers=None, conditional=True, chunk_size=CHUNK_SIZE, progress=None):
+        """Download every endpoint, running up to *max_workers* requests at the
+        same time over a shared keep-alive connection pool.
+
+        Endpoints already recorded in the manifest are requested conditionally
+        (If-None-Match/If-Modified-Since), so unchanged ones only cost a 304
+        response. *force* skips the API status check but still sends conditional
+        requests; set *conditional* False to download everything again.
+
+        Responses are streamed to a temporary `.part` file in *chunk_size* bytes
+        pieces and renamed over the final path once complete, so a crash never
+        leaves a truncated file behind. A leftover `.part` file is resumed with
+        an HTTP Range request. *progress*, if given, is called as
+        `progress(endpoint_name, bytes_received, total_bytes)` after each chunk.
+
+        With *columnar* set (and pyarrow installed) each CSV endpoint is also
+        converted once into a Feather file keyed on its content hash, which
+        `retrieve(..., as_dataframe=True)` then loads instead of the CSV.
+
+        Returns a `HelperFetchReport` with the outcome of each endpoint, or None
+        when the API status is unchanged and *force* is not set."""
 
         if self._check_api_status() and not force:
             print('Last time API was accessed: %s'%self.last)
             print("Current files are up to date.\nTo force process start set *force* True.")
+            return None
 
+        max_workers = max_workers or self.max_workers
+        print(f"Fetching {len(self.endpoints)} endpoints from {self.name.upper()} ({max_workers} workers)")
+        print(f"[{current_date('%b %d. %H:%M', tz=tz.tzlocal())}] Starting process.\n")
+
+        # building directory tree for incoming files
+        self._make_dirs()
+
+        # fetching/storaging files
+        manifest = HelperApiManifest(self.manifest_path)
+        report = HelperFetchReport(self.name, len(self.endpoints))
+        with make_session(pool_size=max_workers) as session, \
+                ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._fetch_endpoint, session, endpoint_name,
+                                       manifest if conditional else None, chunk_size, progress): endpoint_name
+                            for endpoint_name in self.endpoints}
+            for future in as_completed(futures):
+                endpoint_name = futures[future]
+                record = future.result()
+                report.add(endpoint_name, record)
+
+                if record['error'] is not None:
+                    continue
+
+                # storing path to endpoint data
+                self.endpoints[endpoint_name]['data'] = record['path']
+                self.endpoints[endpoint_name]['columnar'] = record.get('columnar')
+                if record['status'] == 304:
+                    manifest.update(endpoint_name, checked=current_date())
+                else:
+                    manifest.update(endpoint_name, **record['validators'], checked=current_date())
+
+        manifest.save()
+        self.last = current_date()
+        print(f'\nFetching files concluded: {report.summary()}.')
+        return report
+
+    def _fetch_endpoint(self, session, endpoint_name, manifest=None, chunk_size=CHUNK_SIZE, progress=None):
+        """Request a single endpoint and stream its content to disk. Errors are
+        recorded instead of raised so that one failing endpoint does not abort
+        the others.
+
+        The manifest is only read here; its entries are updated by the caller."""
+
+        # composing url
+        url = self.api + self._get_api_string(endpoint_name)
+        filename = self._get_filename(endpoint_name)
+        file_out = os.path.join(self.base_directory, self.name, endpoint_name, filename)
+        record = {'url': url, 'path': file_out, 'status': None, 'bytes': 0, 'resumed_from': 0,
+                  'elapsed': 0., 'error': None}
+
+        headers = self._conditional_headers(endpoint_name, file_out, manifest)
+
+        notify = None
+        if progress is not None:
+            notify = lambda n_bytes, total: progress(endpoint_name, n_bytes, total)
+
+        start = time.perf_counter()
+        try:
+            record.update(stream_to_file(session, url, file_out, headers=headers,
+                                         chunk_size=chunk_size, progress=notify))
+        except (requests.RequestException, OSError) as error:
+            record['error'] = str(error)
+
+        if record['error'] is None:
+            record['columnar'] = self._update_columnar(endpoint_name, record, manifest)
+
+        record['elapsed'] = time.perf_counter() - start
+        return record
+
+    def _conditional_headers(self, endpoint_name, file_out, manifest=None):
+        # an interrupted transfer is resumed instead of revalidating the old file
+        if manifest is None or os.path.isfile(file_out + '.part'):
+            return {}
+        return manifest.conditional_headers(endpoint_name, file_out)
+
+    def _update_columnar(self, endpoint_name, record, manifest=None):
+        """Return the columnar file of the endpoint content in *record*, building
+        it when missing. None if the endpoint is not a CSV file or conversion fails."""
+
+        if not self.columnar or not self._is_csv(endpoint_name):
+            return None
+
+        if 'validators' in record:
+            sha1 = record['validators']['sha1']
+        elif manifest is not None and manifest.get(endpoint_name).get('sha1'):
+            sha1 = manifest.get(endpoint_name)['sha1']
         else:
-            print(f"Fetching {len(self.endpoints)} endpoints from {self.name.upper()}")
-            print(f"[{current_date('%b %d. %H:%M', tz=tz.tzlocal())}] Starting process.\n")
+            return None
+
+        try:
+            return write_columnar(record['path'], sha1)
+        except (ValueError, TypeError, OSError):
+            # unparsable content is still served as raw CSV
+            return None
 
-            # building directory tree for incoming files
-            self._make_dirs()
+    def retrieve_many(self, names=None, key='endpoint', categories=None, max_workers=None, **kwargs):
+        """Retrieve several endpoints as a single long `DataFrame`.
 
-            # fetching/storaging files
-            for i, endpoint_name in enumerate(self.endpoints, 1):
-                # composing url
-                print(f'[{i}/{len(self.endpoints)}] Endpoint: {endpoint_name.upper()}', end=' -> ')
-                endpoint_api_string = self._get_api_string(endpoint_name)
-                url = self.api + endpoint_api_string
+        The endpoints in *names* (all by default) are read in parallel by up to
+        *max_workers* threads and stacked in that order, with a categorical
+        *key* column holding the endpoint name of each row. Columns listed in
+        *categories* are converted to categorical dtype. Extra *kwargs* are
+        passed on to `retrieve`."""
 
-                # requesting
-                print('Requesting API', end='... ')
-                response = requests.get(url)
+        names = list(self.endpoints) if names is None else list(names)
+        max_workers = max_workers or self.max_workers
 
-                # writing content
-                filename = self._get_filename(endpoint_name)
-                file_out = os.path.join(self.base_directory, self.name, endpoint_name, filename)
-                with open(file_out, 'wb') as out:
-                    print('Writing content\n')
-                    out.write(response.content)
+        retrieve = lambda name: self.retrieve(name, as_dataframe=True, **kwargs)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            frames = list(executor.map(retrieve, names))
 
-                    # storing path to endpoint data
-                    self.endpoints[endpoint_name]['data'] = file_out
+        missing = [name for name, frame in zip(names, frames) if frame is None]
+        assert not missing, 'Endpoints not fetched yet: %s'%', '.join(missing)
 
-            self.last = current_date()
-            print('Fetching files concluded.')
+        return concat_frames(frames, keys=names, key=key, categories=categories)
 
     def _check_api_status(self):
         check = True
@@ -137,6 +363,9 @@ class ApiManager(HelperApiParser):
     def _get_api_string(self, endpoint_name):
         return self.endpoints[endpoint_name]['api']
 
+    def _is_csv(self, endpoint_name):
+        return urlsplit(self._get_api_string(endpoint_name)).path.endswith('.csv')
+
     def _get_filename(self, endpoint_name):
         api_string = self._get_api_string(endpoint_name)
         filename = re.match(r".*/(.*)$", api_string).group(1)
@@ -196,6 +425,168 @@ def make_config(api_name, api_domain, output_path=None, status=None, endpoints=N
     config.create(output_path)
 
 
+class HelperPartFile():
+    """This class handles the `<path>.part` file of a streamed download: the
+    headers to resume it, incremental hashing of its content and the final
+    atomic rename over *path*.
+
+    The validator of the response that started the part file is kept in
+    `<path>.part.json` so that a resumed transfer can be guarded by If-Range."""
+
+    def __init__(self, path):
+        self.path = path
+        self.part_path = path + '.part'
+        self.meta_path = path + '.part.json'
+        self.offset = os.path.getsize(self.part_path) if os.path.isfile(self.part_path) else 0
+        self.received = 0
+
+    def resume_headers(self):
+        if not self.offset:
+            return {}
+
+        headers = {'Range': f'bytes={self.offset}-'}
+        if os.path.isfile(self.meta_path):
+            with open(self.meta_path) as file:
+                part_meta = json.load(file)
+            if part_meta.get('etag') or part_meta.get('last_modified'):
+                headers['If-Range'] = part_meta.get('etag') or part_meta['last_modified']
+        return headers
+
+    def discard(self):
+        if os.path.isfile(self.part_path):
+            os.remove(self.part_path)
+        self.offset = 0
+
+    def open(self, status, etag, last_modified, chunk_size=CHUNK_SIZE):
+        """Open the part file for the response with *status*: a 206 appends to
+        the current content, anything else starts it over."""
+
+        self.etag, self.last_modified = etag, last_modified
+        self.sha1 = hashlib.sha1()
+        if status == 206:
+            with open(self.part_path, 'rb') as part:
+                for chunk in iter(lambda: part.read(chunk_size), b''):
+                    self.sha1.update(chunk)
+            return open(self.part_path, 'ab')
+
+        self.offset = 0
+        with open(self.meta_path, 'w') as file:
+            json.dump({'etag': etag, 'last_modified': last_modified}, file)
+        return open(self.part_path, 'wb')
+
+    def write(self, out, chunk):
+        out.write(chunk)
+        self.sha1.update(chunk)
+        self.received += len(chunk)
+
+    def total(self, content_length):
+        return self.offset + int(content_length) if content_length is not None else None
+
+    def commit(self):
+        """Rename the complete part file over *path* and return its validators."""
+
+        os.replace(self.part_path, self.path)
+        if os.path.isfile(self.meta_path):
+            os.remove(self.meta_path)
+
+        return {'etag': self.etag,
+                'last_modified': self.last_modified,
+                'sha1': self.sha1.hexdigest(),
+                'size': os.path.getsize(self.path),
+                'fetched': current_date()}
+
+def stream_to_file(session, url, path, headers=None, chunk_size=CHUNK_SIZE, progress=None):
+    """Utility function to download *url* into *path* in fixed-size chunks.
+
+    Content is requested without any content encoding (see `STREAM_HEADERS`),
+    written to `<path>.part` and atomically renamed to *path* once the transfer
+    completes. If a `.part` file is already present the transfer
+    is resumed from its size with a Range request (see `HelperPartFile`).
+
+    Returns a dictionary with the response status, number of bytes received
+    and, unless the response was a 304, the new cache validators."""
+
+    part = HelperPartFile(path)
+    request_headers = {**(headers or {}), **STREAM_HEADERS, **part.resume_headers()}
+
+    with session.get(url, headers=request_headers, stream=True) as response:
+        if response.status_code == 416:
+            # the partial file does not match the remote one anymore: start over
+            part.discard()
+            return stream_to_file(session, url, path, headers, chunk_size, progress)
+
+        response.raise_for_status()
+        result = {'status': response.status_code, 'bytes': 0}
+        if response.status_code == 304:
+            return result
+        if response.status_code == 206:
+            result['resumed_from'] = part.offset
+
+        total = part.total(response.headers.get('Content-Length'))
+        with part.open(response.status_code, response.headers.get('ETag'),
+                       response.headers.get('Last-Modified'), chunk_size) as out:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                part.write(out, chunk)
+                if progress is not None:
+                    progress(part.offset + part.received, total)
+
+    result['bytes'] = part.received
+    result['validators'] = part.commit()
+    return result
+
+def concat_frames(frames, keys, key='endpoint', categories=None):
+    """Utility function to stack *frames* into a single `DataFrame`, adding a
+    categorical *key* column that labels the rows of each frame with *keys*.
+
+    Numeric columns are copied straight into buffers preallocated for the total
+    number of rows, instead of going through `pd.concat`. Columns missing from
+    some frames are filled with NaN. Columns in *categories* become categorical."""
+
+    categories = set(categories or [])
+    lengths = np.array([len(frame) for frame in frames])
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+
+    data = {key: pd.Categorical.from_codes(np.repeat(np.arange(len(keys)), lengths), categories=keys)}
+    columns = list(dict.fromkeys(column for frame in frames for column in frame.columns))
+    for column in columns:
+        parts = [frame[column] if column in frame.columns else None for frame in frames]
+        dtypes = [part.dtype for part in parts if part is not None]
+        incomplete = len(dtypes) < len(parts)
+        numeric = all(isinstance(dtype, np.dtype) and dtype.kind in 'iuf' for dtype in dtypes)
+
+        if column in categories:
+            values = [part.astype('category') for part in parts if part is not None]
+            union = pd.api.types.union_categoricals(values, ignore_order=True).categories
+            codes = np.full(bounds[-1], -1, dtype=np.int32)
+            for part, start, stop in zip(parts, bounds[:-1], bounds[1:]):
+                if part is not None:
+                    codes[start:stop] = union.get_indexer(part)
+            data[column] = pd.Categorical.from_codes(codes, categories=union)
+
+        elif numeric:
+            dtype = np.result_type(*dtypes, *([np.float64] if incomplete else []))
+            buffer = np.empty(bounds[-1], dtype=dtype)
+            for part, start, stop in zip(parts, bounds[:-1], bounds[1:]):
+                buffer[start:stop] = np.nan if part is None else part.to_numpy()
+            data[column] = buffer
+
+        else:
+            empty = lambda n: pd.Series([np.nan] * n, dtype=object)
+            data[column] = pd.concat([empty(n) if part is None else part
+                                        for part, n in zip(parts, lengths)], ignore_index=True)
+
+    return pd.DataFrame(data)
+
+def make_session(pool_size=1):
+    """Utility function to return a `requests.Session` whose connection pool
+    keeps up to *pool_size* connections alive per host."""
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
 def rename_keys(kval_pair, key='name'):
     """Utility function for changing *key* on (key, value) pairs."""
 
@@ -0,0 +1,87 @@
+"""This module implements in-place updates of 2-D `.npy` files, so datasets can grow without being rewritten."""
+
+import io
+import os
+import numpy as np
+from numpy.lib import format as npy_format
+
+def read_header(path):
+    """Utility function returning the (shape, dtype, fortran order flag,
+    format version, header length in bytes) of the `.npy` file at *path*."""
+
+    with open(path, 'rb') as file:
+        version = npy_format.read_magic(file)
+        read_array_header = (npy_format.read_array_header_1_0 if version == (1, 0)
+                             else npy_format.read_array_header_2_0)
+        shape, fortran_order, dtype = read_array_header(file)
+        return shape, dtype, fortran_order, version, file.tell()
+
+def write_rows(path, rows, start):
+    """Write *rows* into the 2-D `.npy` file at *path* from row *start* on.
+
+    Rows before *start* are left untouched. If the rows go past the end of the
+    array, the file grows: the new rows are appended and synced to disk before
+    the header is rewritten in place with the new shape, so an interrupted
+    write never leaves a header claiming missing rows. The cost is
+    proportional to the rows written, not to the whole array. Only if the new
+    header would not fit in the old one's padding (or the array is stored in
+    Fortran order) is the file rewritten, through a temporary file. A missing
+    file is created (with *start* 0).
+
+    Returns the number of rows of the array after the update."""
+
+    rows = np.atleast_2d(rows)
+    if not os.path.isfile(path):
+        assert start == 0, 'A new array must be written from its first row.'
+        np.save(path, rows)
+        return len(rows)
+
+    shape, dtype, fortran_order, version, header_length = read_header(path)
+    assert shape[1:] == rows.shape[1:], 'Rows do not match the stored array shape.'
+    assert 0 <= start <= shape[0], 'Rows must continue the stored array.'
+    n_rows = max(shape[0], start + len(rows))
+
+    if fortran_order:
+        array = np.load(path)
+        array = np.concatenate([array[:start], rows.astype(dtype), array[start + len(rows):]])
+        _save(path, np.ascontiguousarray(array))
+        return len(array)
+
+    if n_rows > shape[0]:
+        header = io.BytesIO()
+        write_array_header = (npy_format.write_array_header_1_0 if version == (1, 0)
+                              else npy_format.write_array_header_2_0)
+        write_array_header(header, {'descr': npy_format.dtype_to_descr(dtype),
+                                    'fortran_order': False,
+                                    'shape': (n_rows, *shape[1:])})
+        if header.tell() != header_length:
+            # the header outgrew its padding: rewriting the whole file
+            array = np.concatenate([np.load(path)[:start], rows.astype(dtype)])
+            _save(path, array)
+            return len(array)
+
+    with open(path, 'r+b') as file:
+        row_size = int(np.prod(shape[1:], dtype=np.int64)) * dtype.itemsize
+        file.seek(header_length + start * row_size)
+        file.write(np.ascontiguousarray(rows, dtype=dtype).tobytes())
+        if n_rows > shape[0]:
+            # the rows must be on disk before the header that counts them
+            file.flush()
+            os.fsync(file.fileno())
+            file.seek(0)
+            file.write(header.getvalue())
+
+    return n_rows
+
+def open_rows(path, mode='r'):
+    """Utility function memory-mapping the `.npy` file at *path*."""
+
+    return npy_format.open_memmap(path, mode=mode)
+
+def _save(path, array):
+    """This function replaces the `.npy` file at *path* with *array* atomically."""
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        np.save(file, array)
+    os.replace(tmp_path, path)
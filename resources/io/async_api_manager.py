@@ -0,0 +1,254 @@
+"""This module implements an asyncio counterpart of `ApiManager`, driven by the same YAML config files."""
+
+import asyncio
+import hashlib
+import os
+import random
+import time
+import dateutil.tz as tz
+from functools import partial
+from urllib.parse import urlsplit
+
+from .api_manager import (HelperApiParser, HelperApiRetriever, HelperApiManifest, HelperFetchReport,
+                          HelperPartFile, ApiManager, CHUNK_SIZE, STREAM_HEADERS, current_date)
+from .columnar import columnar_available
+
+try:
+    import aiohttp
+except ImportError:  # optional dependency, only required by AsyncApiManager
+    aiohttp = None
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class HelperRateLimiter():
+    """This class implements a token bucket limiting the request rate to a
+    single host to *rate* requests per second, allowing bursts of *burst*."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class AsyncApiManager(HelperApiParser):
+    """This class mirrors `ApiManager` without blocking the event loop.
+
+    Endpoints are downloaded with `aiohttp`, at most *max_concurrency* at a time,
+    with at most *rate_limit* requests per second to each host (None for no
+    limit). Requests failing with a connection error or a 429/5xx status are
+    retried up to *max_retries* times with exponential backoff starting at
+    *backoff* seconds. The manifest, `.part` files and directory layout are
+    shared with `ApiManager`, so both can work on the same *base_dir*.
+
+    Disk access (manifest, part files, chunk writes) runs in the loop's
+    default executor, so a slow disk does not stall the other downloads."""
+
+    def __init__(self, path, base_dir, monitor_api=False, max_concurrency=8,
+                 rate_limit=None, max_retries=3, backoff=.5, columnar=True):
+        if aiohttp is None:
+            raise ImportError('AsyncApiManager requires the aiohttp package.')
+
+        HelperApiParser.__init__(self, monitor_api=monitor_api)
+        assert os.path.isdir(base_dir)
+        assert max_concurrency >= 1
+        self.base_directory = os.path.abspath(base_dir)
+        self.max_concurrency = max_concurrency
+        self.rate_limit = rate_limit
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.columnar = columnar and columnar_available()
+
+        self._parse_config_file(path)
+        self._retriever = HelperApiRetriever(self)
+        self.last = ''
+
+    # directory layout is the same as in the blocking manager
+    manifest_path = ApiManager.manifest_path
+    _make_dirs = ApiManager._make_dirs
+    _get_api_string = ApiManager._get_api_string
+    _get_filename = ApiManager._get_filename
+    _is_csv = ApiManager._is_csv
+    _conditional_headers = ApiManager._conditional_headers
+    _update_columnar = ApiManager._update_columnar
+
+    async def fetch(self, force=False, conditional=True, chunk_size=CHUNK_SIZE, progress=None):
+        """Download every endpoint concurrently. Same semantics and return value
+        as `ApiManager.fetch`."""
+
+        loop = asyncio.get_running_loop()
+        async with self._make_session() as session:
+            if await self._check_api_status(session) and not force:
+                print('Last time API was accessed: %s'%self.last)
+                print("Current files are up to date.\nTo force process start set *force* True.")
+                return None
+
+            print(f"Fetching {len(self.endpoints)} endpoints from {self.name.upper()} ({self.max_concurrency} concurrent)")
+            print(f"[{current_date('%b %d. %H:%M', tz=tz.tzlocal())}] Starting process.\n")
+
+            # building directory tree for incoming files
+            await loop.run_in_executor(None, self._make_dirs)
+
+            # fetching/storaging files
+            manifest = await loop.run_in_executor(None, HelperApiManifest, self.manifest_path)
+            report = HelperFetchReport(self.name, len(self.endpoints))
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            async def fetch_endpoint(endpoint_name):
+                async with semaphore:
+                    record = await self._fetch_endpoint(session, endpoint_name,
+                                                        manifest if conditional else None, chunk_size, progress)
+                return endpoint_name, record
+
+            for task in asyncio.as_completed([fetch_endpoint(name) for name in self.endpoints]):
+                endpoint_name, record = await task
+                report.add(endpoint_name, record)
+
+                if record['error'] is not None:
+                    continue
+
+                # storing path to endpoint data
+                self.endpoints[endpoint_name]['data'] = record['path']
+                self.endpoints[endpoint_name]['columnar'] = record.get('columnar')
+                if record['status'] == 304:
+                    manifest.update(endpoint_name, checked=current_date())
+                else:
+                    manifest.update(endpoint_name, **record['validators'], checked=current_date())
+
+        await loop.run_in_executor(None, manifest.save)
+        self.last = current_date()
+        print(f'\nFetching files concluded: {report.summary()}.')
+        return report
+
+    async def retrieve(self, endpoint_name, as_dataframe=False, **kwargs):
+        """Same as `ApiManager.retrieve`. Parsing the local file is CPU bound, so
+        it runs in the loop's default executor instead of on the loop itself."""
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(self._retriever, endpoint_name, as_dataframe, **kwargs))
+
+    async def _fetch_endpoint(self, session, endpoint_name, manifest=None, chunk_size=CHUNK_SIZE, progress=None):
+        # composing url
+        url = self.api + self._get_api_string(endpoint_name)
+        filename = self._get_filename(endpoint_name)
+        file_out = os.path.join(self.base_directory, self.name, endpoint_name, filename)
+        record = {'url': url, 'path': file_out, 'status': None, 'bytes': 0, 'resumed_from': 0,
+                  'elapsed': 0., 'error': None}
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            # a previous attempt may have left a part file to resume
+            headers = await loop.run_in_executor(None, self._conditional_headers, endpoint_name, file_out, manifest)
+            try:
+                record.update(await self._stream_to_file(session, endpoint_name, url, file_out,
+                                                         headers, chunk_size, progress))
+                record['error'] = None
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as error:
+                record['error'] = str(error) or type(error).__name__
+                fatal = isinstance(error, aiohttp.ClientResponseError) and error.status not in RETRY_STATUS
+                if fatal or attempt == self.max_retries:
+                    break
+                await asyncio.sleep(self.backoff * 2**attempt * (1 + random.random()))
+
+        if record['error'] is None:
+            # CSV parsing is CPU bound, keep it off the event loop
+            record['columnar'] = await loop.run_in_executor(
+                None, partial(self._update_columnar, endpoint_name, record, manifest))
+
+        record['elapsed'] = time.perf_counter() - start
+        return record
+
+    async def _stream_to_file(self, session, endpoint_name, url, path, headers, chunk_size, progress):
+        loop = asyncio.get_running_loop()
+        part = await loop.run_in_executor(None, HelperPartFile, path)
+        resume_headers = await loop.run_in_executor(None, part.resume_headers)
+        await self._throttle(url)
+
+        async with session.get(url, headers={**headers, **STREAM_HEADERS, **resume_headers}) as response:
+            if response.status == 416:
+                # the partial file does not match the remote one anymore: start over
+                await loop.run_in_executor(None, part.discard)
+                return await self._stream_to_file(session, endpoint_name, url, path, headers, chunk_size, progress)
+
+            response.raise_for_status()
+            result = {'status': response.status, 'bytes': 0}
+            if response.status == 304:
+                return result
+            if response.status == 206:
+                result['resumed_from'] = part.offset
+
+            total = part.total(response.headers.get('Content-Length'))
+            # opening a resumed part file hashes its current content
+            out = await loop.run_in_executor(None, partial(part.open, response.status, response.headers.get('ETag'),
+                                                           response.headers.get('Last-Modified'), chunk_size))
+            try:
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    await loop.run_in_executor(None, part.write, out, chunk)
+                    if progress is not None:
+                        progress(endpoint_name, part.offset + part.received, total)
+            finally:
+                await loop.run_in_executor(None, out.close)
+
+        result['bytes'] = part.received
+        result['validators'] = await loop.run_in_executor(None, part.commit)
+        return result
+
+    async def _check_api_status(self, session):
+        check = True
+        if self.monitor_api:
+            if not hasattr(self, '_sha1'):
+                self._sha1 = await self._make_hash(session)
+                check = False
+            else:
+                check = self._sha1 == await self._make_hash(session)
+        return check
+
+    async def _make_hash(self, session):
+        status_api = self.api + self.status['api']
+        await self._throttle(status_api)
+        async with session.get(status_api) as response:
+            status_response = await response.json(content_type=None)
+
+        keys = self.status['keys'].copy()
+        while len(keys):
+            key = keys.pop(0)
+            status_response = status_response[key]
+
+        return hashlib.sha1(bytes(status_response, encoding='utf-8')).hexdigest()
+
+    async def _throttle(self, url):
+        if self.rate_limit is None:
+            return
+        host = urlsplit(url).netloc
+        if host not in self._rate_limiters:
+            self._rate_limiters[host] = HelperRateLimiter(self.rate_limit)
+        await self._rate_limiters[host].acquire()
+
+    def _make_session(self):
+        self._rate_limiters = {}
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        return aiohttp.ClientSession(connector=connector, raise_for_status=False)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_rate_limiters', None)
+        return state
+
+async def fetch_all(managers, **kwargs):
+    """Utility function to refresh several `AsyncApiManager` instances at the
+    same time. Returns their fetch reports in the same order."""
+
+    return await asyncio.gather(*(manager.fetch(**kwargs) for manager in managers))
@@ -0,0 +1,66 @@
+"""This module converts retrieved CSV endpoints into typed columnar (Arrow/Feather) files and reads them back."""
+
+import os
+from pandas import read_csv
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # optional dependency, endpoints are then always parsed from CSV
+    pa = None
+
+def columnar_available():
+    """Utility function telling whether the columnar cache can be used."""
+
+    return pa is not None
+
+def selects_by_name(usecols):
+    """Utility function telling whether *usecols*, as `read_csv` takes it, can
+    be served from a columnar file: None or a list of column names (positions
+    and callables are only understood by `read_csv`)."""
+
+    if usecols is None:
+        return True
+    if callable(usecols) or isinstance(usecols, str):
+        return False
+    return all(isinstance(column, str) for column in usecols)
+
+def columnar_path(data_path, sha1):
+    """Utility function returning the columnar file of the endpoint content
+    identified by its *sha1* hash, next to the raw file at *data_path*."""
+
+    return os.path.join(os.path.dirname(data_path), f'{sha1}.feather')
+
+def write_columnar(data_path, sha1):
+    """Parse the CSV file at *data_path* once and store it as an uncompressed
+    Feather (Arrow IPC) file keyed on *sha1*, so it can be memory-mapped later.
+
+    Columnar files of previous contents of the same endpoint are removed.
+    Returns the path of the columnar file."""
+
+    out_path = columnar_path(data_path, sha1)
+    if os.path.isfile(out_path):
+        return out_path
+
+    df = read_csv(data_path)
+    tmp_path = out_path + '.tmp'
+    feather.write_feather(df, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, out_path)
+
+    # dropping stale versions of the endpoint
+    for filename in os.listdir(os.path.dirname(out_path)):
+        if filename.endswith('.feather') and filename != os.path.basename(out_path):
+            os.remove(os.path.join(os.path.dirname(out_path), filename))
+
+    return out_path
+
+def read_columnar(path, columns=None):
+    """Load *columns* (all if None) of the columnar file at *path* into a pandas
+    `DataFrame`. The file is memory-mapped so that only the selected columns are
+    actually read; they keep the file order, as `read_csv(usecols=...)` does."""
+
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select([name for name in table.column_names if name in set(columns)])
+        return table.to_pandas()
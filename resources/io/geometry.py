@@ -0,0 +1,142 @@
+"""This module converts the states shapefile once into pre-simplified, plot-ready geometry arrays and reads them back."""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from matplotlib.path import Path
+
+try:
+    import geopandas as gpd
+except ImportError:  # optional dependency, only needed to build the cache
+    gpd = None
+
+SHAPEFILE = './data/us/cb_2018_us_state_5m.shp'
+CACHE_DIR = './data/us/cache'
+TOLERANCES = (0, .005, .02, .05)
+
+# stores opened by this process, keyed on their directory and crs
+_stores = {}
+
+def geometry_available():
+    """Utility function telling whether geometry caches can be built."""
+
+    return gpd is not None
+
+class GeometryStore():
+    """This class keeps the state boundaries of a shapefile as matplotlib
+    paths, simplified at several tolerances (in the units of the shapefile,
+    degrees for the census files; 0 is the original geometry), optionally
+    re-projected first.
+
+    `build` reads the shapefile once (with geopandas) and writes one `.npz`
+    file per tolerance: the vertices and path codes of all states in flat
+    arrays plus the offsets of each state, indexed by 'state' (postal code)
+    and 'fips'. Loading them needs neither geopandas nor the shapefile, and
+    the paths of each tolerance are built only once per store."""
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, 'manifest.json')) as file:
+            self.manifest = json.load(file)
+        self._paths = {}
+
+    @classmethod
+    def build(cls, shapefile=SHAPEFILE, directory=CACHE_DIR, tolerances=TOLERANCES, crs=None):
+        """Convert *shapefile* into a store in *directory* and return it.
+
+        With *crs* (a string `GeoDataFrame.to_crs` accepts, e.g. 'EPSG:5070'
+        for an equal-area map of the contiguous states) the geometries are
+        re-projected before being simplified, and *tolerances* are then in the
+        units of *crs*. If the store was already built from the same file
+        (same size and modification time) with the same tolerances and crs,
+        it is just opened, which does not need geopandas."""
+
+        stat = os.stat(shapefile)
+        source = dict(path=os.path.abspath(shapefile), size=stat.st_size, mtime=stat.st_mtime)
+        manifest_path = os.path.join(directory, 'manifest.json')
+        if os.path.isfile(manifest_path):
+            with open(manifest_path) as file:
+                manifest = json.load(file)
+            if (manifest['source'] == source and manifest['tolerances'] == list(tolerances)
+                    and manifest.get('crs') == crs):
+                return cls(directory)
+
+        if not geometry_available():
+            raise ImportError('Building geometry caches requires geopandas.')
+        os.makedirs(directory, exist_ok=True)
+        states = gpd.read_file(shapefile) \
+                    .rename({'STATEFP':'fips', 'STUSPS':'state', 'NAME':'name'}, axis=1) \
+                    .set_index('state').sort_index()
+        if crs is not None:
+            states = states.to_crs(crs)
+
+        for tolerance in tolerances:
+            geometries = states.geometry if tolerance == 0 else states.geometry.simplify(tolerance)
+            vertices, codes, offsets = _flatten(geometries)
+            np.savez(os.path.join(directory, _filename(tolerance)), vertices=vertices, codes=codes, offsets=offsets,
+                     state=states.index.to_numpy(dtype=str), fips=states['fips'].to_numpy(dtype=str),
+                     name=states['name'].to_numpy(dtype=str))
+
+        with open(manifest_path, 'w') as file:
+            json.dump(dict(source=source, tolerances=list(tolerances), crs=crs), file, indent=2)
+        return cls(directory)
+
+    @property
+    def tolerances(self):
+        return self.manifest['tolerances']
+
+    @property
+    def crs(self):
+        return self.manifest.get('crs')
+
+    def paths(self, tolerance=.02):
+        """Return the (index, paths) of the states at *tolerance*: a
+        `DataFrame` indexed by state with the 'fips' and 'name' of each one,
+        and a list with one `matplotlib.path.Path` per state, in index order."""
+
+        assert tolerance in self.tolerances, f'Tolerance {tolerance} is not cached ({self.tolerances}).'
+        if tolerance not in self._paths:
+            with np.load(os.path.join(self.directory, _filename(tolerance))) as arrays:
+                vertices, codes, offsets = arrays['vertices'], arrays['codes'], arrays['offsets']
+                index = pd.DataFrame({'fips': arrays['fips'], 'name': arrays['name']},
+                                     index=pd.Index(arrays['state'], name='state'))
+            paths = [Path(vertices[start:stop], codes[start:stop]) for start, stop in zip(offsets[:-1], offsets[1:])]
+            self._paths[tolerance] = (index, paths)
+        return self._paths[tolerance]
+
+def load_store(directory=CACHE_DIR, shapefile=SHAPEFILE, tolerances=TOLERANCES, crs=None):
+    """Utility function returning the geometry store of *directory* for *crs*,
+    opened once per process through `GeometryStore.build` (so it is rebuilt
+    if *shapefile*, *tolerances* or *crs* changed)."""
+
+    key = (directory, crs)
+    if key not in _stores:
+        store = GeometryStore.build(shapefile, directory, tolerances=tolerances, crs=crs)
+        # a store of another crs in the same directory was just overwritten
+        for other in [other for other in _stores if other[0] == directory]:
+            del _stores[other]
+        _stores[key] = store
+    return _stores[key]
+
+def _filename(tolerance):
+    return f'states_{tolerance:g}.npz'
+
+def _flatten(geometries):
+    """This function packs (multi)polygons into flat vertices and path codes
+    (one closed sub-path per ring, holes included) and per-geometry offsets."""
+
+    vertices, codes, offsets = [], [], [0]
+    for geometry in geometries:
+        polygons = getattr(geometry, 'geoms', [geometry])
+        n_vertices = 0
+        for polygon in polygons:
+            for ring in [polygon.exterior, *polygon.interiors]:
+                ring_vertices = np.asarray(ring.coords, dtype=np.float64)[:, :2]
+                ring_codes = np.full(len(ring_vertices), Path.LINETO, dtype=np.uint8)
+                ring_codes[0], ring_codes[-1] = Path.MOVETO, Path.CLOSEPOLY
+                vertices.append(ring_vertices)
+                codes.append(ring_codes)
+                n_vertices += len(ring_vertices)
+        offsets.append(offsets[-1] + n_vertices)
+    return np.concatenate(vertices), np.concatenate(codes), np.asarray(offsets, dtype=np.int64)
@@ -0,0 +1,14 @@
+from resources.utils.lazy import lazy_exports
+
+__all__ = ['HalvingSearch', 'staged_scores', 'truncate_boosting', 'ModelServer', 'load_model', 'evaluate_stages',
+           'staged_predictions', 'backtest', 'rolling_origins', 'SeriesClusterer']
+__getattr__, __dir__ = lazy_exports(__name__, {'HalvingSearch': 'search',
+                                               'staged_scores': 'boosting',
+                                               'truncate_boosting': 'boosting',
+                                               'ModelServer': 'inference',
+                                               'load_model': 'inference',
+                                               'evaluate_stages': 'evaluation',
+                                               'staged_predictions': 'evaluation',
+                                               'backtest': 'backtest',
+                                               'rolling_origins': 'backtest',
+                                               'SeriesClusterer': 'clustering'})
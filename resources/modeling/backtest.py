@@ -0,0 +1,107 @@
+"""This module implements a parallel rolling-origin backtest of regressors over lagged time series."""
+
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.base import clone
+from resources.processing.smoothing import SharedBuffer, resolve_n_jobs
+from .evaluation import STAGED_METRICS
+
+# shared dataset attached by each worker process
+_buffers = {}
+
+def backtest(estimator, dataset, target, origins, horizon=30, metrics=tuple(STAGED_METRICS), refit_every=1, n_jobs=1):
+    """This function evaluates *estimator* from many forecast origins: for
+    each origin, it is fitted on the rows up to the origin and scored on the
+    next *horizon* rows.
+
+    The dataset is built once (e.g. lags of series smoothed once, see
+    `resources.processing.features.lag_matrix`) and shared by every origin: it
+    is copied into one shared memory buffer, which the *n_jobs* worker
+    processes (None or -1 for all cores) attach to instead of receiving copies.
+
+    Parameters
+    ----------
+
+    estimator:
+        An unfitted scikit-learn regressor, cloned for every fit.
+    dataset:
+        A `DataFrame` of features and *target*, one row per period.
+    target:
+        Name of the target column.
+    origins:
+        The last period of each training set, labels of *dataset*'s index.
+        Origins followed by fewer than *horizon* rows are left out.
+    horizon:
+        Number of periods scored after each origin.
+    metrics:
+        Names of `resources.modeling.evaluation.STAGED_METRICS`.
+    refit_every:
+        Refit the estimator every *refit_every* origins only, reusing the last
+        fit in between (origins are taken in order).
+
+    Returns
+    -------
+        A `DataFrame` indexed by origin with the sizes of the training and
+        test sets and one column per metric.
+    """
+
+    index = dataset.index
+    positions = [index.get_loc(pd.Period(origin, freq=index.freq) if isinstance(index, pd.PeriodIndex) else origin)
+                 for origin in origins]
+    assert all(isinstance(position, (int, np.integer)) for position in positions), 'Origins must be single periods.'
+    positions = sorted(position for position in positions if position + horizon < len(index))
+    assert positions, f'No origin has {horizon} periods after it.'
+
+    columns = list(dataset.columns)
+    values = dataset[[column for column in columns if column != target] + [target]].to_numpy(dtype=np.float64)
+    blocks = [positions[start:start + refit_every] for start in range(0, len(positions), refit_every)]
+    tasks = [(estimator, block, horizon, list(metrics), values.shape) for block in blocks]
+    n_jobs = min(resolve_n_jobs(n_jobs), len(blocks))
+
+    if n_jobs <= 1:
+        _buffers['dataset'] = (None, values)
+        try:
+            results = [_run_block(task) for task in tasks]
+        finally:
+            del _buffers['dataset']
+    else:
+        with SharedBuffer(values.size) as data:
+            data.array[:] = values.ravel()
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_attach,
+                                     initargs=(data.name, values.shape)) as executor:
+                # later origins train on more rows, so tasks are handed out one at a time
+                results = list(executor.map(_run_block, tasks))
+
+    records = [record for block in results for record in block]
+    return pd.DataFrame(records, index=index[[record.pop('position') for record in records]]).rename_axis('origin')
+
+def rolling_origins(index, start, stop=None, step=7, horizon=0):
+    """Utility function returning the origins of *index* from *start* to
+    *stop* (the last label if None), every *step* periods, keeping only those
+    followed by at least *horizon* labels."""
+
+    first = index.get_indexer([pd.Period(start, freq=index.freq)])[0] if isinstance(index, pd.PeriodIndex) \
+        else index.get_loc(start)
+    last = len(index) - 1 if stop is None else index.get_indexer([pd.Period(stop, freq=index.freq)])[0]
+    assert first >= 0 and last >= 0, 'Origins out of the index.'
+    return list(index[first:min(last, len(index) - 1 - horizon) + 1:step])
+
+def _attach(name, shape):
+    _buffers['dataset'] = SharedBuffer.attach(name, shape)
+
+def _run_block(task):
+    estimator, positions, horizon, metrics, shape = task
+    _, values = _buffers['dataset']
+    X, y = values[:, :-1], values[:, -1]
+
+    records, model = [], None
+    for position in positions:
+        if model is None:
+            model = clone(estimator).fit(X[:position + 1], y[:position + 1])
+        test = slice(position + 1, position + 1 + horizon)
+        y_pred = model.predict(X[test])
+        record = dict(position=position, n_train=position + 1, n_test=horizon)
+        record.update({name: float(STAGED_METRICS[name](y[test], y_pred)) for name in metrics})
+        records.append(record)
+    return records
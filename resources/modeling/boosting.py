@@ -0,0 +1,35 @@
+"""This module implements helpers for boosting ensembles: scores of every iteration and truncation of fitted models."""
+
+import copy
+import numpy as np
+
+def staged_scores(model, X, y, metric, greater_is_better=False):
+    """This function scores a fitted boosting *model* after each of its
+    iterations, from a single pass of `staged_predict` over *X*.
+
+    Scores are signed like scikit-learn scorers (greater is better), so a loss
+    *metric* is negated. A model that stopped boosting early keeps its last
+    score up to `n_estimators`, as it would predict the same.
+
+    Returns
+    -------
+        A float64 array of length `model.n_estimators`.
+    """
+
+    sign = 1 if greater_is_better else -1
+    scores = [sign * metric(y, y_pred) for y_pred in model.staged_predict(X)]
+    scores += scores[-1:] * (model.n_estimators - len(scores))
+    return np.asarray(scores, dtype=np.float64)
+
+def truncate_boosting(model, n_estimators):
+    """Utility function returning a copy of a fitted boosting *model* keeping
+    only its first *n_estimators* iterations, which predicts as the same model
+    fitted with `n_estimators` would (boosting iterations are sequential and
+    draw from one random state). The estimators themselves are shared."""
+
+    truncated = copy.copy(model)
+    truncated.estimators_ = model.estimators_[:n_estimators]
+    for attribute in ('estimator_weights_', 'estimator_errors_'):
+        setattr(truncated, attribute, getattr(model, attribute)[:n_estimators].copy())
+    truncated.n_estimators = min(n_estimators, model.n_estimators)
+    return truncated
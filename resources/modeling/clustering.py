@@ -0,0 +1,159 @@
+"""This module implements clustering of many time series: PCA projections, a parallel KMeans sweep and incremental updates."""
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.metrics import silhouette_score
+
+class SeriesClusterer():
+    """This class clusters entities (e.g. states) described by a time series
+    each, one row per entity and one column per day.
+
+    The series are centered day by day and projected on their first
+    *n_components* principal components, with a randomized PCA (*solver*
+    'randomized') or, for more rows than fit in memory at once, an incremental
+    PCA over batches of *batch_size* rows ('incremental'). KMeans is then fitted
+    for every number of clusters of *k_range*, *n_init* times each from
+    different seeds; all those fits run in parallel on *n_jobs* processes and
+    the best one of each k is kept. The silhouette of each k is computed on at
+    most *silhouette_sample* entities.
+
+    When new days arrive, `update` extends the decomposition with them without
+    looking at the previous days again (see `update`), and `recluster` refits
+    the chosen KMeans from its previous centers.
+
+    After `fit`, the clusterer has the attributes `coefficients_` (the
+    projections, entities x components), `components_`, `mean_`,
+    `singular_values_`, `explained_variance_ratio_`, `sweep_` (a `DataFrame`
+    of inertia and silhouette by k) and `models_` (the best KMeans of each k)."""
+
+    def __init__(self, n_components=4, k_range=range(1, 11), n_init=30, solver='randomized', batch_size=None,
+                 silhouette_sample=None, n_jobs=-1, random_state=None):
+        assert solver in ('randomized', 'incremental'), f'Unknown solver: {solver}'
+        self.n_components = n_components
+        self.k_range = list(k_range)
+        self.n_init = n_init
+        self.solver = solver
+        self.batch_size = batch_size
+        self.silhouette_sample = silhouette_sample
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def fit(self, data):
+        index = data.index if isinstance(data, pd.DataFrame) else None
+        data = np.asarray(data, dtype=np.float64)
+
+        if self.solver == 'randomized':
+            pca = PCA(n_components=self.n_components, svd_solver='randomized', random_state=self.random_state)
+        else:
+            pca = IncrementalPCA(n_components=self.n_components, batch_size=self.batch_size)
+        coefficients = pca.fit_transform(data)
+
+        self.index_ = index
+        self.n_samples_ = len(data)
+        self.mean_ = pca.mean_
+        self.components_ = pca.components_
+        self.singular_values_ = pca.singular_values_
+        self.total_variance_ = np.sum(np.var(data, axis=0, ddof=1))
+        self.coefficients_ = coefficients
+        self.sweep()
+        return self
+
+    def sweep(self):
+        """Fit KMeans for every k of `k_range` on the current projections and
+        return (and keep in `sweep_`) the inertia and silhouette of each k."""
+
+        seeds = np.random.RandomState(self.random_state).randint(np.iinfo(np.int32).max, size=self.n_init)
+        fits = Parallel(n_jobs=self.n_jobs)(delayed(_fit_kmeans)(self.coefficients_, k, seed)
+                                            for k in self.k_range for seed in seeds)
+
+        self.models_ = {}
+        for k, model in zip((k for k in self.k_range for _ in seeds), fits):
+            if k not in self.models_ or model.inertia_ < self.models_[k].inertia_:
+                self.models_[k] = model
+
+        rows = []
+        for k, model in self.models_.items():
+            silhouette = np.nan
+            if 1 < k < self.n_samples_:
+                silhouette = silhouette_score(self.coefficients_, model.labels_, sample_size=self._sample_size(),
+                                              random_state=self.random_state)
+            rows.append(dict(k=k, inertia=model.inertia_, silhouette=silhouette))
+        self.sweep_ = pd.DataFrame(rows).set_index('k')
+        return self.sweep_
+
+    def best_k(self):
+        """Return the k of highest silhouette in `sweep_`."""
+
+        return int(self.sweep_['silhouette'].idxmax())
+
+    def labels(self, k=None):
+        """Return the cluster of every entity for *k* clusters (the best k if None)."""
+
+        k = self.best_k() if k is None else k
+        return pd.Series(self.models_[k].labels_, index=self.index_, name='cluster')
+
+    def projections(self):
+        """Return `coefficients_` as a `DataFrame` (columns 'coeff_1', 'coeff_2', ...)."""
+
+        columns = ['coeff_%d'%i for i in range(1, self.coefficients_.shape[1] + 1)]
+        return pd.DataFrame(self.coefficients_, index=self.index_, columns=columns)
+
+    def update(self, new_data):
+        """This function appends new days (columns of *new_data*, one row per
+        entity, in the same order) to the decomposition.
+
+        The thin SVD of the centered data is updated with the new columns
+        (Brand's incremental SVD): its cost depends on the number of entities,
+        components and new days, not on how many days came before. Since every
+        day is centered on its own, the result is the truncated decomposition
+        of all the days (up to the truncation of the previous one). Components
+        keep their previous signs, so that projections stay comparable."""
+
+        new_data = np.asarray(new_data, dtype=np.float64)
+        assert len(new_data) == self.n_samples_, 'New days must have one row per entity.'
+        new_mean = new_data.mean(axis=0)
+        centered = new_data - new_mean
+
+        r = len(self.singular_values_)
+        U = self.coefficients_ / self.singular_values_
+        L = U.T @ centered
+        # K has min(entities, new days) rows
+        J, K = np.linalg.qr(centered - U @ L)
+        middle = np.block([[np.diag(self.singular_values_), L], [np.zeros((len(K), r)), K]])
+        U_mid, S, Vt_mid = np.linalg.svd(middle, full_matrices=False)
+
+        coefficients = np.hstack([U, J]) @ U_mid[:, :r] * S[:r]
+        components = np.hstack([Vt_mid[:r, :r] @ self.components_, Vt_mid[:r, r:]])
+        signs = np.sign(np.sum(coefficients * self.coefficients_, axis=0))
+        signs[signs == 0] = 1
+
+        self.coefficients_ = coefficients * signs
+        self.components_ = components * signs[:, None]
+        self.singular_values_ = S[:r]
+        self.mean_ = np.concatenate([self.mean_, new_mean])
+        self.total_variance_ += np.sum(np.var(new_data, axis=0, ddof=1))
+        return self
+
+    def recluster(self, k=None):
+        """Refit the KMeans of *k* clusters (the best k if None) on the current
+        projections, starting from its previous centers, and return the labels."""
+
+        k = self.best_k() if k is None else k
+        previous = self.models_[k]
+        self.models_[k] = KMeans(n_clusters=k, init=previous.cluster_centers_, n_init=1).fit(self.coefficients_)
+        return self.labels(k)
+
+    @property
+    def explained_variance_ratio_(self):
+        return self.singular_values_ ** 2 / (self.n_samples_ - 1) / self.total_variance_
+
+    def _sample_size(self):
+        if self.silhouette_sample is None or self.silhouette_sample >= self.n_samples_:
+            return None
+        return self.silhouette_sample
+
+def _fit_kmeans(X, k, seed):
+    return KMeans(n_clusters=min(k, len(X)), n_init=1, random_state=seed).fit(X)
@@ -0,0 +1,99 @@
+"""This module implements vectorized evaluation of boosting models over all their stages."""
+
+import numpy as np
+from itertools import islice
+from .inference import compile_linear_boosting
+
+def mean_squared_error(y_true, y_pred):
+    """Mean squared error of each row of *y_pred* (stages x samples)."""
+
+    return np.mean((y_pred - y_true) ** 2, axis=-1)
+
+def mean_absolute_error(y_true, y_pred):
+    """Mean absolute error of each row of *y_pred* (stages x samples)."""
+
+    return np.mean(np.abs(y_pred - y_true), axis=-1)
+
+def relative_error(y_true, y_pred):
+    """Relative error of the total predicted by each row of *y_pred*, as in
+    the evaluation notebook: (sum(y_pred) - sum(y_true)) / sum(y_true)."""
+
+    true_total = np.sum(y_true)
+    return (np.sum(y_pred, axis=-1) - true_total) / true_total
+
+STAGED_METRICS = {'mean_squared_error': mean_squared_error,
+                  'mean_absolute_error': mean_absolute_error,
+                  'relative_error': relative_error}
+
+def staged_predictions(model, X, max_chunk_bytes=64 * 2**20):
+    """This function yields the predictions of every stage of a fitted
+    boosting *model* on *X*, as (first stage, stages x samples array) chunks
+    of at most about *max_chunk_bytes*.
+
+    Ensembles of linear models (see `compile_linear_boosting`) predict every
+    estimator once and take the weighted median of each stage from one sort
+    per sample; other models go through `staged_predict`."""
+
+    X = np.asarray(X, dtype=np.float64)
+    compiled = compile_linear_boosting(model)
+
+    if compiled is None:
+        stages = model.staged_predict(X)
+        chunk_stages = max(1, max_chunk_bytes // (8 * len(X)))
+        start = 0
+        while True:
+            chunk = list(islice(stages, chunk_stages))
+            if not chunk:
+                return
+            yield start, np.stack(chunk)
+            start += len(chunk)
+
+    coefficients, intercepts, weights = compiled
+    predictions = X @ coefficients.T + intercepts
+    order = np.argsort(predictions, axis=1)
+    sorted_predictions = np.take_along_axis(predictions, order, axis=1)
+    sorted_weights = weights[order]
+    n_estimators = len(weights)
+    rows = np.arange(len(X))
+
+    # stage s uses the estimators before s: masking the sorted estimators
+    # gives the weighted median of every stage without sorting again
+    chunk_stages = max(1, max_chunk_bytes // (8 * len(X) * n_estimators))
+    for start in range(0, n_estimators, chunk_stages):
+        limits = np.arange(start + 1, min(start + chunk_stages, n_estimators) + 1)
+        used = order[None, :, :] < limits[:, None, None]
+        weight_cdf = np.cumsum(used * sorted_weights, axis=2)
+        median_index = (weight_cdf >= .5 * weight_cdf[:, :, -1:]).argmax(axis=2)
+        yield start, sorted_predictions[rows, median_index]
+
+def evaluate_stages(model, X, y, metrics=tuple(STAGED_METRICS), max_chunk_bytes=64 * 2**20):
+    """This function evaluates *metrics* for every stage of a boosting *model*
+    in one pass over its staged predictions (see `staged_predictions`).
+
+    Metrics are names of `STAGED_METRICS`, computed for a whole chunk of stages
+    at once, or of any other `sklearn.metrics` function, computed stage by stage.
+
+    Returns
+    -------
+        A structured array with a 'stage' field (starting at 1) and one float64
+        field per metric, one record per stage.
+    """
+
+    y = np.asarray(y, dtype=np.float64)
+    funcs = {}
+    for name in metrics:
+        if name in STAGED_METRICS:
+            funcs[name] = STAGED_METRICS[name]
+        else:
+            import sklearn.metrics
+            metric = getattr(sklearn.metrics, name)
+            funcs[name] = lambda y_true, y_pred, metric=metric: np.array([metric(y_true, row) for row in y_pred])
+
+    chunks = []
+    for start, y_pred in staged_predictions(model, X, max_chunk_bytes):
+        chunk = np.empty(len(y_pred), dtype=[('stage', np.int32)] + [(name, np.float64) for name in metrics])
+        chunk['stage'] = np.arange(start + 1, start + len(y_pred) + 1)
+        for name, func in funcs.items():
+            chunk[name] = func(y, y_pred)
+        chunks.append(chunk)
+    return np.concatenate(chunks)
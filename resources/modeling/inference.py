@@ -0,0 +1,117 @@
+"""This module implements a long-lived inference component: cached model loading and batch/streaming predictions."""
+
+import os
+import warnings
+import numpy as np
+
+# models loaded by this process, keyed on their file
+_models = {}
+
+# rows per compiled evaluation, bounds the (rows x estimators) temporaries
+CHUNK_ROWS = 1024
+
+def load_model(path, mmap_mode='r'):
+    """This function loads the joblib model at *path* once per process.
+
+    Later calls return the same object until the file changes (its
+    modification time or size). Numpy arrays of uncompressed dumps are
+    memory-mapped with *mmap_mode*, so they are paged in from the OS cache
+    instead of being copied. Dumps whose arrays are not byte aligned (written
+    by joblib < 1.2, such as data/model.pkl) are loaded into memory instead,
+    since unaligned memory maps are unsafe for some libraries (e.g. BLAS)."""
+
+    stat = os.stat(path)
+    key = (os.path.abspath(path), mmap_mode)
+    version = (stat.st_mtime_ns, stat.st_size)
+    if key not in _models or _models[key][0] != version:
+        _models[key] = (version, _load(path, mmap_mode))
+    return _models[key][1]
+
+def _load(path, mmap_mode):
+    import joblib
+
+    if mmap_mode is None:
+        return joblib.load(path)
+
+    # joblib warns about every unaligned array it memory-maps
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        model = joblib.load(path, mmap_mode=mmap_mode)
+    unaligned = False
+    for warning in caught:
+        if 'not byte aligned' in str(warning.message):
+            unaligned = True
+        else:
+            warnings.warn_explicit(warning.message, warning.category, warning.filename, warning.lineno)
+    return joblib.load(path) if unaligned else model
+
+class ModelServer():
+    """This class keeps a fitted regressor in memory and predicts on batches
+    of rows (`predict`) or on a stream of rows (`predict_stream`).
+
+    Boosting ensembles of linear models (e.g. `AdaBoostRegressor` over `Ridge`)
+    are compiled into one coefficient matrix: a batch then costs one matrix
+    product and a weighted median, instead of one `predict` call per estimator.
+    Any other model is served through its own `predict`."""
+
+    def __init__(self, model, mmap_mode='r', compile=True):
+        self.model = load_model(model, mmap_mode) if isinstance(model, str) else model
+        self.n_features = getattr(self.model, 'n_features_in_', None)
+        self.compiled = compile_linear_boosting(self.model) if compile else None
+
+    def predict(self, X):
+        """Return the predictions of the rows of *X* (a single row can be given as a 1-D array)."""
+
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        assert self.n_features is None or X.shape[1] == self.n_features, \
+            f'Expected {self.n_features} features, got {X.shape[1]}.'
+        if self.compiled is None:
+            return self.model.predict(X)
+        if len(X) <= CHUNK_ROWS:
+            return weighted_median_predict(X, *self.compiled)
+        return np.concatenate([weighted_median_predict(X[start:start + CHUNK_ROWS], *self.compiled)
+                               for start in range(0, len(X), CHUNK_ROWS)])
+
+    def predict_stream(self, rows, batch_size=1):
+        """Predict on an iterable of rows, yielding one prediction per row.
+
+        Rows are grouped into micro-batches of *batch_size*; 1 answers every
+        row as soon as it arrives, larger sizes trade latency for throughput."""
+
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield from self.predict(batch)
+                batch.clear()
+        if batch:
+            yield from self.predict(batch)
+
+def compile_linear_boosting(model):
+    """Utility function returning the (coefficients, intercepts, weights) of
+    an `AdaBoostRegressor` whose estimators are all single-target linear
+    models, or None for any other model."""
+
+    estimators = getattr(model, 'estimators_', None)
+    weights = getattr(model, 'estimator_weights_', None)
+    if not estimators or weights is None or not hasattr(model, '_get_median_predict'):
+        return None
+    if not all(np.ndim(getattr(estimator, 'coef_', None)) == 1 for estimator in estimators):
+        return None
+
+    coefficients = np.stack([estimator.coef_ for estimator in estimators]).astype(np.float64)
+    intercepts = np.array([estimator.intercept_ for estimator in estimators], dtype=np.float64)
+    return coefficients, intercepts, np.asarray(weights[:len(estimators)], dtype=np.float64)
+
+def weighted_median_predict(X, coefficients, intercepts, weights):
+    """Utility function predicting as `AdaBoostRegressor` does (the weighted
+    median of the estimators' predictions) from compiled linear estimators."""
+
+    predictions = X @ coefficients.T + intercepts
+    sorted_index = np.argsort(predictions, axis=1)
+    weight_cdf = np.cumsum(weights[sorted_index], axis=1)
+    median_index = (weight_cdf >= .5 * weight_cdf[:, -1:]).argmax(axis=1)
+    rows = np.arange(len(X))
+    return predictions[rows, sorted_index[rows, median_index]]
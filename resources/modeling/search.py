@@ -0,0 +1,189 @@
+"""This module implements a parallel, resumable successive-halving search over the iterations of boosting estimators."""
+
+import os
+import json
+import math
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.base import clone
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import ParameterGrid
+from .boosting import staged_scores, truncate_boosting
+
+class HalvingSearch():
+    """This class searches the hyperparameters of an estimator by successive
+    halving on one of its integer parameters, the *resource* (by default the
+    number of boosting iterations).
+
+    Every candidate of *param_grid* is first cross-validated with few
+    iterations; only the best 1/*factor* of them go on to the next round, with
+    *factor* times more iterations, until the last round runs with
+    *max_resources* (by default the estimator's own value). The fits of a round
+    run in parallel on *n_jobs* processes (-1 for all cores).
+
+    With a *staged_metric* (a function of y_true and y_pred, see
+    `staged_scores`), the resource itself becomes a hyperparameter: each fit is
+    scored after every one of its iterations through `staged_predict`, a
+    candidate is ranked by its best mean score over iteration counts, and
+    `best_estimator_` is truncated to the best count. *factor* None runs a
+    single round with *max_resources* (an exhaustive search).
+
+    If *checkpoint* is a file path, the score of every fit is saved there as
+    soon as it is known (see `_unordered`), and a later search with the same
+    candidates, data and splits picks up from it instead of starting over. *cv*
+    must then give the same splits on every call (e.g. have a fixed
+    random_state).
+
+    After `fit`, the search has the attributes `best_params_`, `best_score_`,
+    `best_estimator_` (refitted on all the data with *max_resources*),
+    `best_resources_` and `cv_results_` (a `DataFrame` with one row per
+    candidate and round)."""
+
+    def __init__(self, estimator, param_grid, cv, scoring=None, resource='n_estimators', max_resources=None,
+                 min_resources=1, factor=3, staged_metric=None, greater_is_better=False, n_jobs=-1,
+                 checkpoint=None, verbose=0):
+        assert factor is None or factor > 1, 'The factor must be greater than 1.'
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.scoring = scoring
+        self.resource = resource
+        self.max_resources = max_resources
+        self.min_resources = min_resources
+        self.factor = factor
+        self.staged_metric = staged_metric
+        self.greater_is_better = greater_is_better
+        self.n_jobs = n_jobs
+        self.checkpoint = checkpoint
+        self.verbose = verbose
+
+    def schedule(self, n_candidates):
+        """Return the resource of each round for *n_candidates* candidates."""
+
+        max_resources = self.max_resources or self.estimator.get_params()[self.resource]
+        if self.factor is None or n_candidates <= 1:
+            return [max_resources]
+        n_rounds = max(1, math.ceil(math.log(n_candidates, self.factor)))
+        return [max(self.min_resources, int(max_resources / self.factor ** (n_rounds - 1 - i)))
+                for i in range(n_rounds)]
+
+    def fit(self, X, y):
+        candidates = list(ParameterGrid(self.param_grid))
+        splits = list(self.cv.split(X, y))
+        schedule = self.schedule(len(candidates))
+        scorer = check_scoring(self.estimator, scoring=self.scoring)
+        scores = self._load_checkpoint(self._signature(X, y, candidates, splits, schedule))
+
+        alive, rows = list(range(len(candidates))), []
+        for round_, resources in enumerate(schedule):
+            if self.verbose:
+                print(f'[HALVING SEARCH] Round {round_}: {len(alive)} candidates x {resources} {self.resource}')
+
+            tasks = [(candidate, split) for candidate in alive for split in range(len(splits))
+                     if _key(candidate, resources, split) not in scores]
+            self._run(tasks, X, y, candidates, splits, resources, scorer, scores)
+
+            means, best_resources = {}, {}
+            for candidate in alive:
+                # one row per split, one column per iteration count when staged
+                split_scores = np.array([scores[_key(candidate, resources, split)] for split in range(len(splits))])
+                split_scores = split_scores.reshape(len(splits), -1)
+                best = int(np.argmax(split_scores.mean(axis=0)))
+                means[candidate] = split_scores[:, best].mean()
+                best_resources[candidate] = best + 1 if self.staged_metric is not None else resources
+                rows.append(dict(round=round_, resources=resources, candidate=candidate, params=candidates[candidate],
+                                 best_resources=best_resources[candidate], mean_test_score=means[candidate],
+                                 std_test_score=split_scores[:, best].std()))
+
+            alive = sorted(alive, key=lambda candidate: -means[candidate])
+            if round_ < len(schedule) - 1 and self.factor is not None:
+                alive = alive[:max(1, math.ceil(len(alive) / self.factor))]
+
+        self.best_index_ = alive[0]
+        self.best_params_ = candidates[self.best_index_]
+        self.best_score_ = means[self.best_index_]
+        self.best_resources_ = best_resources[self.best_index_]
+        self.cv_results_ = pd.DataFrame(rows)
+        self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_, **{self.resource: schedule[-1]})
+        self.best_estimator_.fit(X, y)
+        if self.staged_metric is not None:
+            self.best_estimator_ = truncate_boosting(self.best_estimator_, self.best_resources_)
+        return self
+
+    def _run(self, tasks, X, y, candidates, splits, resources, scorer, scores):
+        jobs = (delayed(_fit_and_score)(_key(candidate, resources, split), self.estimator,
+                                        {**candidates[candidate], self.resource: resources},
+                                        X, y, *splits[split], scorer, self.staged_metric, self.greater_is_better)
+                for candidate, split in tasks)
+
+        saved_at = time.monotonic()
+        for key, score in _unordered(jobs, self.n_jobs):
+            scores[key] = score
+            # saving at most once a second, a fit is much cheaper to redo than to wait for the disk
+            if time.monotonic() - saved_at > 1:
+                self._save_checkpoint(scores)
+                saved_at = time.monotonic()
+        self._save_checkpoint(scores)
+
+    def _signature(self, X, y, candidates, splits, schedule):
+        sha1 = hashlib.sha1()
+        for array in (X, y, *(index for split in splits for index in split)):
+            sha1.update(np.ascontiguousarray(array).tobytes())
+        staged = getattr(self.staged_metric, '__qualname__', self.staged_metric)
+        sha1.update(repr((candidates, schedule, self.resource, self.scoring, staged,
+                          self.greater_is_better, self.estimator)).encode())
+        self._state_signature = sha1.hexdigest()
+        return self._state_signature
+
+    def _load_checkpoint(self, signature):
+        if self.checkpoint is None or not os.path.isfile(self.checkpoint):
+            return {}
+        with open(self.checkpoint) as file:
+            state = json.load(file)
+        if state.get('signature') != signature:
+            if self.verbose:
+                print('[HALVING SEARCH] Checkpoint belongs to another search, starting over.')
+            return {}
+        if self.verbose:
+            print(f'[HALVING SEARCH] Resuming from {len(state["scores"])} fits.')
+        return state['scores']
+
+    def _save_checkpoint(self, scores):
+        if self.checkpoint is None:
+            return
+        tmp_path = self.checkpoint + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump({'signature': self._state_signature, 'scores': scores}, file)
+        os.replace(tmp_path, self.checkpoint)
+
+def _key(candidate, resources, split):
+    return f'{candidate}|{resources}|{split}'
+
+def _fit_and_score(key, estimator, params, X, y, train, test, scorer, staged_metric=None, greater_is_better=False):
+    model = clone(estimator).set_params(**params).fit(X[train], y[train])
+    if staged_metric is not None:
+        return key, staged_scores(model, X[test], y[test], staged_metric, greater_is_better).tolist()
+    return key, float(scorer(model, X[test], y[test]))
+
+def _unordered(jobs, n_jobs):
+    """Utility function running joblib *jobs* on *n_jobs* workers and yielding
+    their results as they complete. Before joblib 1.4 (no unordered generator
+    output) they are run in batches of a few jobs per worker instead, yielded
+    batch by batch."""
+
+    try:
+        parallel = Parallel(n_jobs=n_jobs, return_as='generator_unordered')
+    except (TypeError, ValueError):
+        parallel = None
+    if parallel is not None:
+        yield from parallel(jobs)
+        return
+
+    jobs = list(jobs)
+    batch_size = 4 * effective_n_jobs(n_jobs)
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for start in range(0, len(jobs), batch_size):
+            yield from parallel(jobs[start:start + batch_size])
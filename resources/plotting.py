@@ -1,44 +1,62 @@
 """This is a python modulo for grouping plotting functions."""
+import re
+import copy
 import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection, PolyCollection, PatchCollection
+from matplotlib.patches import PathPatch
+from matplotlib.lines import Line2D
 
-def parallelplot(df, category, centroids=False, interval=False, color=None, alpha=None, ax=None):
-    """Plot records of DataFrame *df* in parallel coordinates in accordance to the categoriacal field *category*."""
+def parallelplot(df, category, centroids=False, interval=False, color=None, alpha=None, ax=None,
+                 max_records=None, random_state=None):
+    """Plot records of DataFrame *df* in parallel coordinates in accordance to the categoriacal field *category*.
 
-    fields = df.drop(category, axis=1).columns
-    cat_values = df[category].unique()
+    All the lines are drawn as a single `LineCollection` (and intervals as a
+    single `PolyCollection`), and the statistics of the centroids come from one
+    aggregation of all categories. With *max_records*, at most about that many
+    records are drawn, sampled in the same proportion from every category
+    (and at least one each)."""
+
+    fields = df.columns.drop(category)
+    codes, cat_values = pd.factorize(df[category])
+    colors = np.array(['C'+str(i) for i in range(len(cat_values))])
+    values = df[fields].to_numpy(dtype=float)
     xs = np.arange(len(fields))
-    ymin, ymax = df.min().min() * 1.1, df.max().max() * 1.1
-    lineHandle = []
- 
+    ymin, ymax = np.nanmin(values) * 1.1, np.nanmax(values) * 1.1
+
     if ax is None:
         _, ax = plt.subplots()
     ax.set_ylim(ymin, ymax)
 
     if centroids:
-        data = df.groupby(category).mean().reindex(cat_values).to_numpy()
+        # mean, std and the 5%/95% percentiles of every category in one pass
+        stats = df.groupby(codes)[fields].describe(percentiles=[.05, .95])
+        data = stats.xs('mean', axis=1, level=1).to_numpy()
         if interval == 'std':
-            std = df.groupby(category).std().reindex(cat_values)
-            sup = data + std.to_numpy() * 1.96
-            low = data - std.to_numpy() * 1.96
+            std = stats.xs('std', axis=1, level=1).to_numpy()
+            sup, low = data + std * 1.96, data - std * 1.96
         if interval == 'robust':
-            pctl = df.groupby(category).apply(lambda s: s.quantile([.05, .95])).reindex(cat_values, level=0).swaplevel()
-            sup = pctl.loc[0.95, fields].to_numpy()
-            low = pctl.loc[0.05, fields].to_numpy()
+            sup = stats.xs('95%', axis=1, level=1).to_numpy()
+            low = stats.xs('5%', axis=1, level=1).to_numpy()
 
-        for i, ys in enumerate(data):
-            line = ax.plot(xs, ys, color='k', lw=1.5, marker='s', mfc='C'+str(i), ms=7)
-            lineHandle.append(line[0])
-            if interval:
-                ax.fill_between(xs, sup[i], low[i], alpha=alpha, lw=.5, color='C'+str(i))
+        if interval:
+            polygons = [np.column_stack([np.concatenate([xs, xs[::-1]]), np.concatenate([sup[i], low[i][::-1]])])
+                        for i in range(len(data))]
+            ax.add_collection(PolyCollection(polygons, facecolors=colors, edgecolors=colors, alpha=alpha, lw=.5))
+        ax.add_collection(LineCollection(_segments(xs, data), colors='k', lw=1.5))
+        ax.scatter(np.tile(xs, len(data)), data.ravel(), c=np.repeat(colors, len(xs)), marker='s', s=49,
+                   edgecolors='k', zorder=3)
+        lineHandle = [Line2D([], [], color='k', lw=1.5, marker='s', mfc=c, ms=7) for c in colors]
 
     else:
-        data = [df[df[category] == value][fields].to_numpy() for value in cat_values]
-        for i, ys in enumerate(data):
-            lines = ax.plot(ys.T, color='C'+str(i), alpha=alpha)
-            lineHandle.append(lines[0])
-    
-    for i in xs[1:-1]:
-        ax.vlines(i, ymin, ymax, lw=.5, color='gray')
+        if max_records is not None and len(values) > max_records:
+            keep = _stratified_sample(codes, max_records / len(values), random_state)
+            values, codes = values[keep], codes[keep]
+        ax.add_collection(LineCollection(_segments(xs, values), colors=colors[codes], alpha=alpha))
+        lineHandle = [Line2D([], [], color=c) for c in colors]
+
+    ax.vlines(xs[1:-1], ymin, ymax, lw=.5, color='gray')
     ax.set_xlim(xs.min(), xs.max())
     ax.set_xticks(xs)
     ax.set_xticklabels(fields)
@@ -47,6 +65,70 @@ def parallelplot(df, category, centroids=False, interval=False, color=None, alph
 
     return ax
 
+def choropleth(values, store=None, tolerance=.02, cmap='cividis', vmin=None, vmax=None, missing_color='lightgray',
+               extent=None, legend=True, ax=None, **kwargs):
+    """Plot the per-state Series *values* (indexed by postal code or by fips)
+    as a choropleth map.
+
+    The boundaries come from a cached `resources.io.geometry.GeometryStore`
+    (*store*, by default the one of the census shapefile, built on first use)
+    simplified at *tolerance*, and are drawn as a single `PatchCollection`, so
+    the shapefile is never read again. States without a value are drawn in
+    *missing_color*. *extent* is (xmin, xmax, ymin, ymax), e.g.
+    (-130, -60, 20, 55) for the contiguous states; *kwargs* go to the
+    collection."""
+
+    from resources.io.geometry import load_store
+
+    store = load_store() if store is None else store
+    index, paths = store.paths(tolerance)
+    if values.index.isin(index.index).any():
+        key = index.index
+    else:
+        # fips codes are strings in the census files ('01') but often integers elsewhere
+        fips = index['fips'].astype(int) if pd.api.types.is_numeric_dtype(values.index) else index['fips']
+        key = pd.Index(fips)
+    data = np.ma.masked_invalid(values.reindex(key).to_numpy(dtype=float))
+
+    if ax is None:
+        _, ax = plt.subplots()
+    colormap = plt.get_cmap(cmap)
+    if hasattr(colormap, 'with_extremes'):
+        colormap = colormap.with_extremes(bad=missing_color)
+    else:  # matplotlib < 3.4
+        colormap = copy.copy(colormap)
+        colormap.set_bad(missing_color)
+    collection = PatchCollection([PathPatch(path) for path in paths], cmap=colormap, **kwargs)
+    collection.set_array(data)
+    collection.set_clim(vmin, vmax)
+    ax.add_collection(collection)
+
+    if extent is None:
+        ax.autoscale_view()
+    else:
+        ax.set_xlim(*extent[:2])
+        ax.set_ylim(*extent[2:])
+    ax.set_aspect('equal')
+    if legend:
+        ax.figure.colorbar(collection, ax=ax, shrink=.5)
+
+    return ax
+
+def _segments(xs, ys):
+    """This function builds the (lines x points x 2) vertices of polylines sharing the abscissas *xs*."""
+
+    return np.stack(np.broadcast_arrays(xs, ys), axis=-1)
+
+def _stratified_sample(codes, fraction, random_state=None):
+    """This function returns the sorted positions of a sample of *fraction* of
+    the records of every category code (at least one record each)."""
+
+    order = np.random.default_rng(random_state).permutation(len(codes))
+    shuffled = codes[order]
+    rank = pd.Series(shuffled).groupby(shuffled).cumcount().to_numpy()
+    quota = np.maximum(1, np.round(np.bincount(codes) * fraction))
+    return np.sort(order[rank < quota[shuffled]])
+
 def _parse_interval(interval):
     """this function parses interval string inputs."""
 
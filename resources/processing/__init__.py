@@ -1 +1,13 @@
-from .transformer import DataframeTransformer
\ No newline at end of file
+from resources.utils.lazy import lazy_exports
+
+__all__ = ['DataframeTransformer', 'StepCache', 'StepProfiler', 'LoggerSink', 'JsonLinesSink', 'StatsSink',
+           'lag_matrix', 'lag_correlations', 'best_lags']
+__getattr__, __dir__ = lazy_exports(__name__, {'DataframeTransformer': 'transformer',
+                                               'StepCache': 'cache',
+                                               'StepProfiler': 'profiling',
+                                               'LoggerSink': 'profiling',
+                                               'JsonLinesSink': 'profiling',
+                                               'StatsSink': 'profiling',
+                                               'lag_matrix': 'features',
+                                               'lag_correlations': 'features',
+                                               'best_lags': 'features'})
@@ -0,0 +1,205 @@
+"""This module implements a bounded cache of `DataframeTransformer` step results keyed on content hashes."""
+
+import os
+import pickle
+import hashlib
+import marshal
+import types
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from functools import partial
+
+MISSING = object()
+
+# step arguments that change how a result is computed, never the result itself
+EXECUTION_KWARGS = {'n_jobs'}
+
+class StepCache():
+    """This class is a two-level LRU cache of pipeline step results.
+
+    Results are kept in memory up to *max_memory_bytes* and, if a *directory*
+    is given, pickled to disk up to *max_disk_bytes*. The least recently used
+    entries are evicted first at both levels (disk recency is tracked with the
+    files' modification times, so it survives between runs)."""
+
+    def __init__(self, directory=None, max_memory_bytes=256 * 2**20, max_disk_bytes=2 * 2**30):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.hits = self.misses = 0
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, key):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return _copy(self.memory[key][0])
+
+        path = self._path(key)
+        if path is not None and os.path.isfile(path):
+            with open(path, 'rb') as file:
+                value = pickle.load(file)
+            os.utime(path)
+            self._remember(key, value)
+            self.hits += 1
+            return _copy(value)
+
+        self.misses += 1
+        return MISSING
+
+    def put(self, key, value):
+        self._remember(key, _copy(value))
+
+        path = self._path(key)
+        if path is not None:
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            self._evict_disk()
+
+    def clear(self):
+        self.memory.clear()
+        self.memory_bytes = 0
+        if self.directory is not None:
+            for filename in os.listdir(self.directory):
+                if filename.endswith('.pkl'):
+                    os.remove(os.path.join(self.directory, filename))
+
+    def _remember(self, key, value):
+        size = nbytes(value)
+        if size > self.max_memory_bytes:
+            return
+        if key in self.memory:
+            self.memory_bytes -= self.memory.pop(key)[1]
+        self.memory[key] = (value, size)
+        self.memory_bytes += size
+
+        while self.memory_bytes > self.max_memory_bytes:
+            _, (_, evicted_size) = self.memory.popitem(last=False)
+            self.memory_bytes -= evicted_size
+
+    def _evict_disk(self):
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.pkl')]
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in entries)
+        while entries and total > self.max_disk_bytes:
+            entry = entries.pop(0)
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def _path(self, key):
+        return None if self.directory is None else os.path.join(self.directory, key + '.pkl')
+
+def hash_frame(df):
+    """Utility function returning a SHA1 hex digest of the content, index,
+    columns and dtypes of a pandas object (or of any picklable object)."""
+
+    sha1 = hashlib.sha1()
+    if isinstance(df, (pd.DataFrame, pd.Series)):
+        if isinstance(df, pd.DataFrame):
+            layout = ('DataFrame', list(df.columns), list(df.dtypes), df.index.dtype)
+        else:
+            layout = ('Series', df.name, df.dtype, df.index.dtype)
+        sha1.update(repr(layout).encode())
+        try:
+            sha1.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+            return sha1.hexdigest()
+        except TypeError:
+            # unhashable cells (e.g. arrays in object columns)
+            pass
+    sha1.update(pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL))
+    return sha1.hexdigest()
+
+def step_keys(input_key, names, kwargs_list, by=None, versions=None):
+    """Utility function chaining the cache keys of every step of a pipeline.
+
+    The key of a step hashes the key of the previous one with the step name,
+    its kwargs and its *versions* entry (see `code_fingerprint`), so changing
+    a step, or its code, only invalidates it and the steps after it."""
+
+    versions = [None] * len(names) if versions is None else versions
+    keys, key = [], hashlib.sha1(f'{input_key}|{by}'.encode()).hexdigest()
+    for name, kwargs, version in zip(names, kwargs_list, versions):
+        arguments = sorted((k, stable_repr(v)) for k, v in kwargs.items() if k not in EXECUTION_KWARGS)
+        description = repr((name, arguments, version))
+        key = hashlib.sha1(f'{key}|{description}'.encode()).hexdigest()
+        keys.append(key)
+    return keys
+
+def stable_repr(value):
+    """Utility function returning a representation of a step argument that is
+    the same between runs (functions are named, not given by address)."""
+
+    if callable(value) and hasattr(value, '__qualname__'):
+        name = f'{getattr(value, "__module__", "")}.{value.__qualname__}'
+        code = getattr(value, '__code__', None)
+        if code is not None and '<' in value.__qualname__:
+            # lambdas and local functions share names, tell them apart by their code
+            cells = [stable_repr(cell.cell_contents) for cell in value.__closure__ or ()]
+            name += hashlib.sha1(marshal.dumps(code) + repr(cells).encode()).hexdigest()
+        return name
+    if isinstance(value, (list, tuple)):
+        return type(value).__name__ + repr([stable_repr(item) for item in value])
+    return repr(value)
+
+def code_fingerprint(func):
+    """Utility function returning a SHA1 hex digest of the code of a step
+    *func* and of everything of this package it calls by name (functions and
+    whole classes, recursively), so that cached results are not reused once
+    the implementation of a step changes. Line numbers and file paths are
+    left out: moving code around keeps the fingerprint."""
+
+    package = __name__.split('.')[0]
+    sha1, pending, seen = hashlib.sha1(), [func], set()
+    while pending:
+        value = pending.pop()
+        if isinstance(value, (staticmethod, classmethod)):
+            value = value.__func__
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+
+        if isinstance(value, partial):
+            pending.extend(item for item in [value.func, *value.keywords.values()] if callable(item))
+        elif isinstance(value, type) and value.__module__.startswith(package):
+            sha1.update(value.__qualname__.encode())
+            pending.extend(item for _, item in sorted(vars(value).items(), reverse=True)
+                           if isinstance(item, (types.FunctionType, staticmethod, classmethod)))
+        elif isinstance(value, types.FunctionType) and value.__module__.startswith(package):
+            sha1.update(_code_repr(value.__code__).encode())
+            pending.extend(value.__globals__[name] for name in reversed(_code_names(value.__code__))
+                           if name in value.__globals__)
+    return sha1.hexdigest()
+
+def nbytes(value):
+    """Utility function estimating the memory held by a step result."""
+
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+def _code_repr(code):
+    consts = [_code_repr(const) if isinstance(const, types.CodeType) else repr(const) for const in code.co_consts]
+    return repr((code.co_code, code.co_names, code.co_varnames, consts))
+
+def _code_names(code):
+    # global names used by *code* and the functions nested in it
+    names = list(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names += _code_names(const)
+    return list(dict.fromkeys(names))
+
+def _copy(value):
+    # callers may modify what they get back, which must not alter the cached entry
+    return value.copy() if hasattr(value, 'copy') else value
@@ -0,0 +1,92 @@
+"""This module implements lag features: strided lag matrices and a cross-correlation search for the best lags."""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+def lag_view(values, max_lag):
+    """Utility function returning a read-only view of shape
+    (n_rows - max_lag, n_features, max_lag + 1) over the 2-D array *values*,
+    where `view[t, j, lag]` is `values[t + max_lag - lag, j]`. No data is copied."""
+
+    return sliding_window_view(values, max_lag + 1, axis=0)[..., ::-1]
+
+def lag_matrix(df, lags):
+    """This function builds the lagged features of *df* in one gather from a
+    strided view of its values (see `lag_view`), instead of one shifted copy
+    per feature and lag.
+
+    Parameters
+    ----------
+
+    df:
+        A `DataFrame` indexed by period.
+    lags:
+        A dict mapping each feature to a lag or to a list of lags. A single lag
+        keeps the feature name, a list names the columns '<feature>_lag<lag>'.
+
+    Returns
+    -------
+        A `DataFrame` with one column per feature and lag, indexed from the
+        first period for which every lag is available (as `shift` + `dropna`
+        would on complete data).
+    """
+
+    features = list(lags)
+    per_feature = {feature: np.atleast_1d(lags[feature]).astype(int) for feature in features}
+    max_lag = int(max(lag.max() for lag in per_feature.values()))
+    assert min(lag.min() for lag in per_feature.values()) >= 0, 'Lags must not be negative.'
+
+    columns, feature_index, lag_index = [], [], []
+    for position, feature in enumerate(features):
+        for lag in per_feature[feature]:
+            columns.append(feature if np.ndim(lags[feature]) == 0 else f'{feature}_lag{lag}')
+            feature_index.append(position)
+            lag_index.append(lag)
+
+    view = lag_view(df[features].to_numpy(dtype=np.float64), max_lag)
+    return pd.DataFrame(view[:, feature_index, lag_index], index=df.index[max_lag:], columns=columns)
+
+def lag_correlations(df, features, target, max_lag):
+    """This function computes the Pearson correlation between *target* and each
+    of *features* lagged by 0 to *max_lag* periods, the same coefficient as
+    `np.corrcoef(x[:n - lag], y[lag:])` for every lag, in O(n log n).
+
+    The lagged cross products of all features come from a single FFT, and the
+    means and variances of the overlapping windows from cumulative sums.
+
+    Returns
+    -------
+        A `DataFrame` indexed by lag with one column per feature.
+    """
+
+    x = df[features].to_numpy(dtype=np.float64)
+    y = df[target].to_numpy(dtype=np.float64).ravel()
+    n = len(y)
+    assert 0 <= max_lag < n - 1, 'Not enough data for the lags asked.'
+
+    # correlations do not depend on location/scale, standardizing keeps the sums well conditioned
+    x = (x - x.mean(axis=0)) / x.std(axis=0)
+    y = (y - y.mean()) / y.std()
+
+    size = 1 << (2 * n - 1).bit_length()
+    cross = np.fft.irfft(np.conj(np.fft.rfft(x, size, axis=0)) * np.fft.rfft(y, size)[:, None], size, axis=0)
+    sum_xy = cross[:max_lag + 1]
+
+    lags = np.arange(max_lag + 1)
+    counts = (n - lags)[:, None]
+    cumsum = lambda values: np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+    cx, cxx = cumsum(x), cumsum(x ** 2)
+    cy, cyy = cumsum(y), cumsum(y ** 2)
+    sum_x, sum_xx = cx[n - lags], cxx[n - lags]
+    sum_y, sum_yy = (cy[n] - cy[lags])[:, None], (cyy[n] - cyy[lags])[:, None]
+
+    covariance = counts * sum_xy - sum_x * sum_y
+    correlation = covariance / np.sqrt((counts * sum_xx - sum_x ** 2) * (counts * sum_yy - sum_y ** 2))
+    return pd.DataFrame(correlation, index=pd.Index(lags, name='lag'), columns=features)
+
+def best_lags(correlations, min_lag=0):
+    """Utility function returning, for each feature of *correlations* (see
+    `lag_correlations`), the lag of highest correlation not below *min_lag*."""
+
+    return {feature: int(lag) for feature, lag in correlations.loc[min_lag:].idxmax().items()}
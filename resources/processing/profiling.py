@@ -0,0 +1,124 @@
+"""This module implements per-step instrumentation of `DataframeTransformer` pipelines."""
+
+import json
+import time
+import logging
+import tracemalloc
+import pandas as pd
+from collections import defaultdict
+
+class StepProfiler():
+    """This class measures every step it runs and hands one record per step to
+    each of its *sinks*.
+
+    A record holds the step position and name, wall and CPU time (seconds),
+    the peak memory allocated while the step ran (bytes, through `tracemalloc`,
+    only if *trace_memory* is set) and the number of rows and columns of its
+    input and output. A sink is any callable taking a record (see `LoggerSink`,
+    `JsonLinesSink` and `StatsSink`).
+
+    Before Python 3.9 the peak of a trace cannot be reset, so the memory is
+    only measured when the profiler starts the trace itself (i.e. nothing else
+    is tracing already)."""
+
+    def __init__(self, sinks=None, trace_memory=True):
+        self.sinks = list(sinks) if sinks is not None else [StatsSink()]
+        self.trace_memory = trace_memory
+
+    def run(self, position, name, step, df):
+        record = {'step': position, 'name': name, 'rows_in': n_rows(df), 'columns_in': n_columns(df)}
+
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        # a trace started here has no earlier peak, an older one needs reset_peak (Python 3.9+)
+        trace_memory = started_tracing or (self.trace_memory and hasattr(tracemalloc, 'reset_peak'))
+        if trace_memory:
+            if not started_tracing:
+                tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            result = step(df)
+        finally:
+            record['wall_time'] = time.perf_counter() - wall
+            record['cpu_time'] = time.process_time() - cpu
+            if trace_memory:
+                record['peak_memory'] = tracemalloc.get_traced_memory()[1] - memory_before
+            if started_tracing:
+                tracemalloc.stop()
+
+        record.update(rows_out=n_rows(result), columns_out=n_columns(result))
+        for sink in self.sinks:
+            sink(record)
+        return result
+
+    @property
+    def stats(self):
+        """The first `StatsSink` of the profiler, if any."""
+
+        return next((sink for sink in self.sinks if isinstance(sink, StatsSink)), None)
+
+class LoggerSink():
+    """This class writes each step record to a `logging` logger."""
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger('resources.processing')
+        self.level = level
+
+    def __call__(self, record):
+        self.logger.log(self.level,
+                        '[%(step)d] %(name)s: %(wall_time).4fs wall, %(cpu_time).4fs cpu, '
+                        '%(rows_in)s x %(columns_in)s -> %(rows_out)s x %(columns_out)s', record)
+
+class JsonLinesSink():
+    """This class appends each step record as a JSON line to the file *path*."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, record):
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(record) + '\n')
+
+class StatsSink():
+    """This class keeps the step records in memory and aggregates them by step."""
+
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, record):
+        self.records.append(record)
+
+    def summary(self):
+        """Return a `DataFrame` with the number of calls and the total and
+        maximum times and memory of each step."""
+
+        totals = defaultdict(lambda: defaultdict(float))
+        for record in self.records:
+            entry = totals[(record['step'], record['name'])]
+            entry['calls'] += 1
+            for key in ('wall_time', 'cpu_time'):
+                entry[key] += record[key]
+                entry['max_' + key] = max(entry['max_' + key], record[key])
+            entry['max_peak_memory'] = max(entry['max_peak_memory'], record.get('peak_memory', 0))
+
+        summary = pd.DataFrame.from_dict({key: dict(value) for key, value in totals.items()}, orient='index')
+        summary.index.names = ['step', 'name']
+        return summary
+
+    def clear(self):
+        self.records.clear()
+
+def n_rows(obj):
+    """Utility function returning the number of rows of a step input/output."""
+
+    shape = getattr(obj, 'shape', None)
+    return shape[0] if shape else None
+
+def n_columns(obj):
+    """Utility function returning the number of columns of a step input/output."""
+
+    shape = getattr(obj, 'shape', None)
+    return (shape[1] if len(shape) > 1 else 1) if shape else None
@@ -0,0 +1,218 @@
+"""This module implements a parallel STL smoothing engine for many time series at once."""
+
+import os
+import itertools
+import tempfile
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8, shared buffers are then memory-mapped temporary files
+    shared_memory = None
+
+# shared buffers attached by each worker process
+_buffers = {}
+
+def stl_many(series, period, seasonal, n_jobs=1, component='trend', **stl_kwargs):
+    """This function fits an STL decomposition to every series in *series* and
+    returns the chosen *component* of each one, in the same order.
+
+    The series are packed into one flat float64 buffer in shared memory and
+    fitted by a pool of *n_jobs* processes (None or -1 for all cores), which
+    attach to the buffer instead of receiving copies of the data. Each worker
+    writes its results straight into a shared output buffer, so the output
+    order never depends on which fit finishes first. With *n_jobs* 1 the fits
+    run in the calling process.
+
+    Parameters
+    ----------
+
+    series:
+        A sequence of 1-D arrays, possibly of different lengths.
+    period, seasonal:
+        Passed on to `statsmodels.tsa.api.STL`.
+    n_jobs:
+        Number of worker processes.
+    component:
+        Which STL component to return: 'trend', 'seasonal' or 'resid'.
+    stl_kwargs:
+        Any other `STL` argument (e.g. robust=True).
+
+    Returns
+    -------
+        A list of 1-D float64 arrays.
+    """
+
+    series = [np.asarray(values, dtype=np.float64) for values in series]
+    bounds = np.concatenate([[0], np.cumsum([len(values) for values in series])]).astype(np.int64)
+    n_jobs = min(resolve_n_jobs(n_jobs), len(series))
+    fit_kwargs = dict(period=period, seasonal=seasonal, component=component, **stl_kwargs)
+
+    if n_jobs <= 1:
+        return [fit_component(values, **fit_kwargs) for values in series]
+
+    with SharedBuffer(bounds[-1]) as data, SharedBuffer(bounds[-1]) as output:
+        for values, start in zip(series, bounds[:-1]):
+            data.array[start:start + len(values)] = values
+
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_attach,
+                                 initargs=(data.name, output.name, bounds[-1], bounds[-1])) as executor:
+            tasks = [(start, stop, fit_kwargs) for start, stop in zip(bounds[:-1], bounds[1:])]
+            list(executor.map(_fit_segment, tasks, chunksize=max(1, len(tasks) // (4 * n_jobs))))
+
+        return [output.array[start:stop].copy() for start, stop in zip(bounds[:-1], bounds[1:])]
+
+def stl_search(series, periods, seasonals, robust=(False,), n_jobs=1):
+    """This function fits STL with every combination of *periods*,
+    *seasonals* and *robust* to every series in *series* and scores the fits.
+
+    As in `stl_many`, the series are packed once into shared memory and every
+    (series, parameters) fit is a task of a pool of *n_jobs* processes, which
+    writes its scores into a shared output buffer. Two scores are computed,
+    both relative to the variance of the series so that series of different
+    scales weigh the same:
+
+    resid_var:
+        Variance of the residuals (how much the decomposition leaves out).
+    roughness:
+        Mean squared second difference of the trend (how wiggly it is).
+
+    Combinations where seasonal is even or below 3 are skipped (STL needs
+    odd seasonal windows).
+
+    Returns
+    -------
+        A `DataFrame` with one row per combination (columns 'period',
+        'seasonal' and 'robust') and the mean and maximum of each score over
+        the series, sorted by mean residual variance.
+    """
+
+    series = [np.asarray(values, dtype=np.float64) for values in series]
+    bounds = np.concatenate([[0], np.cumsum([len(values) for values in series])]).astype(np.int64)
+    grid = [(period, seasonal, bool(is_robust))
+            for period, seasonal, is_robust in itertools.product(periods, seasonals, robust)
+            if seasonal >= 3 and seasonal % 2 == 1]
+    segments = list(zip(bounds[:-1], bounds[1:]))
+    tasks = [(start, stop, position, dict(period=period, seasonal=seasonal, robust=is_robust))
+             for position, ((period, seasonal, is_robust), (start, stop))
+             in enumerate(itertools.product(grid, segments))]
+    n_jobs = min(resolve_n_jobs(n_jobs), len(tasks))
+
+    with SharedBuffer(bounds[-1]) as data, SharedBuffer(2 * len(tasks)) as output:
+        for values, start in zip(series, bounds[:-1]):
+            data.array[start:start + len(values)] = values
+
+        if n_jobs <= 1:
+            _buffers['data'] = (None, data.array)
+            _buffers['output'] = (None, output.array)
+            try:
+                for task in tasks:
+                    _score_segment(task)
+            finally:
+                _buffers.clear()
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_attach,
+                                     initargs=(data.name, output.name, bounds[-1], 2 * len(tasks))) as executor:
+                list(executor.map(_score_segment, tasks, chunksize=max(1, len(tasks) // (4 * n_jobs))))
+
+        scores = output.array.reshape(len(grid), len(series), 2).copy()
+
+    results = pd.DataFrame(grid, columns=['period', 'seasonal', 'robust'])
+    for position, name in enumerate(['resid_var', 'roughness']):
+        results[name] = scores[:, :, position].mean(axis=1)
+        results['max_' + name] = scores[:, :, position].max(axis=1)
+    return results.sort_values('resid_var', ignore_index=True)
+
+def best_stl_params(results, criterion='resid_var', max_roughness=None):
+    """Utility function returning the STL parameters of the row of
+    *results* (see `stl_search`) with the lowest *criterion*, among those with
+    a mean roughness up to *max_roughness* if given, as keyword arguments of
+    the `smoothen` transformer step."""
+
+    if max_roughness is not None:
+        results = results[results['roughness'] <= max_roughness]
+    assert len(results), 'No parameters meet the roughness bound.'
+    best = results.loc[results[criterion].idxmin()]
+    return dict(period=int(best['period']), seasonal=int(best['seasonal']), robust=bool(best['robust']))
+
+def fit_component(values, period, seasonal, component='trend', **stl_kwargs):
+    """Utility function returning one STL *component* of a 1-D array, or a
+    tuple of components if *component* is a tuple of names."""
+
+    from statsmodels.tsa.seasonal import STL  # slow to import, only fits need it
+
+    result = STL(values, period=period, seasonal=seasonal, **stl_kwargs).fit()
+    if isinstance(component, tuple):
+        return tuple(np.asarray(getattr(result, name), dtype=np.float64) for name in component)
+    return np.asarray(getattr(result, component), dtype=np.float64)
+
+def resolve_n_jobs(n_jobs):
+    """Utility function translating *n_jobs* (None or negative for all cores)
+    into a number of worker processes."""
+
+    if n_jobs is None or n_jobs < 0:
+        return os.cpu_count() or 1
+    return max(1, n_jobs)
+
+class SharedBuffer():
+    """This class owns a flat float64 array in shared memory, released when
+    the context exits. Other processes reach it by its `name` (see `attach`).
+
+    Without `multiprocessing.shared_memory` (Python < 3.8) the array is a
+    memory-mapped temporary file instead, and `name` is its path."""
+
+    def __init__(self, size):
+        size = int(size)
+        if shared_memory is not None:
+            self.shm = shared_memory.SharedMemory(create=True, size=max(1, size) * 8)
+            self.name = self.shm.name
+            self.array = np.ndarray((size,), dtype=np.float64, buffer=self.shm.buf)
+        else:
+            self.shm = None
+            file, self.name = tempfile.mkstemp(suffix='.buffer')
+            os.close(file)
+            self.array = np.memmap(self.name, dtype=np.float64, mode='w+', shape=(max(1, size),))[:size]
+
+    @staticmethod
+    def attach(name, shape):
+        """Return a (handle, array) pair viewing the buffer *name* as a float64
+        array of *shape*. The handle must live as long as the array."""
+
+        if shared_memory is not None:
+            shm = shared_memory.SharedMemory(name=name)
+            return shm, np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        size = int(np.prod(shape))
+        return None, np.memmap(name, dtype=np.float64, mode='r+', shape=(max(1, size),))[:size].reshape(shape)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        del self.array
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+        else:
+            os.remove(self.name)
+
+def _attach(data_name, output_name, size, output_size):
+    for key, name, length in (('data', data_name, size), ('output', output_name, output_size)):
+        _buffers[key] = SharedBuffer.attach(name, (length,))
+
+def _fit_segment(task):
+    start, stop, fit_kwargs = task
+    _, data = _buffers['data']
+    _, output = _buffers['output']
+    output[start:stop] = fit_component(data[start:stop], **fit_kwargs)
+
+def _score_segment(task):
+    start, stop, position, params = task
+    _, data = _buffers['data']
+    _, output = _buffers['output']
+    values = data[start:stop]
+    trend, resid = fit_component(values, component=('trend', 'resid'), **params)
+    scale = np.var(values) or 1.
+    output[2 * position] = np.var(resid) / scale
+    output[2 * position + 1] = np.mean(np.diff(trend, 2) ** 2) / scale
@@ -1,12 +1,17 @@
 """This module contains class containers of custom methods for pandas `DataFrame` objects."""
 
+import numpy as np
 import pandas as pd
-from resources.io import ApiManager
-from resources.utils import compose, curry
-from statsmodels.tsa.api import STL
+from resources.utils import bind
+from functools import partial
+from .smoothing import stl_many
+from .cache import MISSING, code_fingerprint, hash_frame, step_keys
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas.core.tools.datetimes import guess_datetime_format
 
-import os
-print(os.getcwd())
 class Piper():
     def __init__(self, steps):
         assert isinstance(steps, list)
@@ -30,19 +35,56 @@ class DataframeCustomMethods():
     """This is class is only a container for a set to custom pandas `DataFrame` methods.""" 
 
     @staticmethod
-    def convert_date_to_index(df):
-        df = df.assign(date = df['date'].apply(pd.Period)) \
-                .set_index('date').sort_index(ascending=True)
-        return df
+    def convert_date_to_index(df, date_format=None, freq=None):
+        """Replace the `date` column by a sorted `PeriodIndex`.
+
+        Dates are parsed in one vectorized pass (see `parse_dates`) and the
+        frequency is inferred from them unless *freq* is given. Data already in
+        ascending or descending date order is not sorted again."""
+
+        dates = parse_dates(df['date'], date_format)
+        index = pd.PeriodIndex(dates, freq=freq or infer_period_freq(dates), name='date')
+        df = df.drop(columns='date').set_axis(index, axis=0)
+
+        if index.is_monotonic_increasing:
+            return df
+        elif index.is_monotonic_decreasing:
+            return df.iloc[::-1]
+        else:
+            return df.iloc[np.argsort(index.asi8, kind='stable')]
     
     @staticmethod
     def filling_period_index(df):
         if not missing_period(df.index):
             return df
         else:
-            new_index = pd.period_range(start=df.index[0], end=df.index[-1], freq=df.index.freq)
+            ordinals = df.index.asi8
+            new_index = ordinals_to_index(np.arange(ordinals[0], ordinals[-1] + 1),
+                                          freq=df.index.freq, name=df.index.name)
             return df.reindex(new_index)
     
+    @staticmethod
+    def filling_period_window(df, start, stop):
+        """Same result as `filling_period_index` followed by `slice_dataframe`,
+        but only the rows inside the window get reindexed."""
+
+        if len(df) == 0:
+            return df
+
+        ordinals = df.index.asi8
+        lower, upper = period_bounds(start, stop, df.index.freq)
+        lower = ordinals[0] if lower is None else max(lower, ordinals[0])
+        upper = ordinals[-1] if upper is None else min(upper, ordinals[-1])
+
+        window = df.iloc[np.searchsorted(ordinals, lower):np.searchsorted(ordinals, upper, side='right')]
+        if not missing_period(df.index):
+            return window
+
+        if len(window) != max(upper - lower + 1, 0):
+            new_index = ordinals_to_index(np.arange(lower, upper + 1), freq=df.index.freq, name=df.index.name)
+            window = window.reindex(new_index)
+        return as_reindexed(window)
+
     @staticmethod
     def slice_dataframe(df, start, stop, step=None):
         slice_obj = slice(start, stop, step)
@@ -58,27 +100,358 @@ class DataframeCustomMethods():
     
     @staticmethod
     def apply_func(df, func):
-        print(type(func))
         return df.apply(func)
 
     @staticmethod
-    def smoothen(df, period, seasonal):
-        smoother = lambda endog: STL(endog, period=period, seasonal=seasonal).fit().trend
-        return df.apply(smoother, axis=0)
+    def smoothen(df, period, seasonal, n_jobs=1, robust=False):
+        """Replace every column by its STL trend, fitting up to *n_jobs* columns
+        in parallel (see `resources.processing.smoothing.stl_many`; parameters
+        can be chosen with `resources.processing.smoothing.stl_search`)."""
+
+        trends = stl_many([df[column] for column in df.columns], period, seasonal, n_jobs=n_jobs, robust=robust)
+        return pd.DataFrame(np.column_stack(trends), index=df.index, columns=df.columns)
+
+class GroupedDataframeMethods():
+    """This class is a container for the grouped counterparts of `DataframeCustomMethods`.
+
+    They work on a single long `DataFrame` holding many entities (e.g. states),
+    identified by the column *by*, and process all of them in one vectorized
+    operation. Rows are kept sorted by entity, then by date."""
+
+    @staticmethod
+    def convert_date_to_index(df, by, date_format=None, freq=None):
+        # rows come out sorted by date, a stable sort on the entity keeps that order within entities
+        df = DataframeCustomMethods.convert_date_to_index(df, date_format, freq)
+        order = np.argsort(pd.factorize(df[by], sort=True)[0], kind='stable')
+        return df.iloc[order]
+
+    @staticmethod
+    def filling_period_index(df, by):
+        """Insert the missing periods of every entity between its own first and
+        last period, as `DataframeCustomMethods.filling_period_index` does."""
+
+        ordinals = df.index.asi8
+        starts, stops = entity_bounds(df, by)
+        first, last = ordinals[starts], ordinals[stops - 1]
+        if (last - first + 1).sum() == len(df):
+            return df
+
+        run = np.repeat(np.arange(len(starts)), stops - starts)
+        return fill_entities(df, by, run, df[by].iloc[starts], first, last)
+
+    @staticmethod
+    def filling_period_window(df, by, start, stop):
+        """Same result as `filling_period_index` followed by `slice_dataframe`,
+        but only the rows of each entity inside the window get reindexed."""
+
+        ordinals = df.index.asi8
+        starts, stops = entity_bounds(df, by)
+        first, last = ordinals[starts], ordinals[stops - 1]
+        gaps = (last - first + 1).sum() != len(df)
+
+        lower, upper = period_bounds(start, stop, df.index.freq)
+        lower = first if lower is None else np.maximum(first, lower)
+        upper = last if upper is None else np.minimum(last, upper)
+
+        run = np.repeat(np.arange(len(starts)), stops - starts)
+        mask = (ordinals >= lower[run]) & (ordinals <= upper[run])
+        if not gaps:
+            return df[mask]
+
+        window = fill_entities(df[mask], by, run[mask], df[by].iloc[starts], lower, upper)
+        return as_reindexed(window)
+
+    @staticmethod
+    def slice_dataframe(df, by, start, stop, step=None):
+        # the ordinal bounds of label slicing, e.g. 'jun-2020' starts on June 1st
+        lower, upper = period_bounds(start, stop, df.index.freq)
+        ordinals = df.index.asi8
+        mask = np.ones(len(df), dtype=bool)
+        if lower is not None:
+            mask &= ordinals >= lower
+        if upper is not None:
+            mask &= ordinals <= upper
+        return df[mask]
+
+    @staticmethod
+    def select_features(df, by, features):
+        return df.loc[:, [by] + [feature for feature in features if feature != by]]
+
+    @staticmethod
+    def smoothen(df, by, period, seasonal, n_jobs=1, robust=False):
+        """Fit the STL trend of every (entity, column) series in a single call of
+        `stl_many`, so the fits of all entities share one process pool."""
+
+        features = df.columns.drop(by)
+        bounds = list(zip(*entity_bounds(df, by)))
+        segments = [df[feature].to_numpy(dtype=float)[start:stop] for feature in features for start, stop in bounds]
+        trends = iter(stl_many(segments, period, seasonal, n_jobs=n_jobs, robust=robust))
+
+        smoothed = {feature: np.concatenate([next(trends) for _ in bounds]) for feature in features}
+        return df.assign(**smoothed)
+
+    @staticmethod
+    def groupby_feature(df, by, agg_func, feature):
+        """With `np.array` as *agg_func*, return a dense (entity x period)
+        `DataFrame` of *feature*, NaN where an entity has no value for a period.
+        Any other *agg_func* is applied per entity as in the ungrouped method."""
+
+        if agg_func not in (np.array, np.asarray):
+            return df.groupby(by=by, observed=True)[feature].agg(agg_func)
+
+        codes, entities = pd.factorize(df[by], sort=True)
+        ordinals = df.index.asi8
+        start = ordinals.min() if len(df) else 0
+        n_periods = ordinals.max() - start + 1 if len(df) else 0
+
+        matrix = np.full((len(entities), n_periods), np.nan)
+        matrix[codes, ordinals - start] = df[feature].to_numpy(dtype=float)
+        columns = ordinals_to_index(start + np.arange(n_periods), freq=df.index.freq, name=df.index.name)
+        return pd.DataFrame(matrix, index=pd.Index(entities, name=by), columns=columns)
+
+def entity_bounds(df, by):
+    """Utility function returning the (start, stop) row positions of each entity
+    in *df*, whose rows are sorted by the column *by*."""
+
+    codes = pd.factorize(df[by])[0]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(df) else np.array([], dtype=int)
+    stops = np.r_[starts[1:], len(df)].astype(int)
+    return starts, stops
+
+# steps that only act on rows, whatever the columns are
+ROW_STEPS = {'convert_date_to_index', 'filling_period_index', 'slice_dataframe'}
+
+def plan_steps(steps):
+    """Utility function rewriting a list of (name, kwargs) steps into an
+    equivalent one that handles less data.
+
+    * Each `select_features` is moved before the row-only steps preceding it
+      (keeping the `date` column when it passes `convert_date_to_index`), so
+      the discarded columns are never converted, reindexed or sliced.
+    * A `filling_period_index` directly followed by a `slice_dataframe` is
+      fused into `filling_period_window`, which slices before reindexing."""
+
+    plan = [(name, dict(kwargs or {})) for name, kwargs in steps]
+
+    # projection pushdown
+    for i, (name, kwargs) in enumerate(plan):
+        if name != 'select_features' or not isinstance(kwargs.get('features'), (list, tuple)):
+            continue
+        j = i
+        while j > 0 and plan[j - 1][0] in ROW_STEPS:
+            if plan[j - 1][0] == 'convert_date_to_index':
+                if 'date' in kwargs['features']:
+                    break
+                kwargs = dict(kwargs, features=list(kwargs['features']) + ['date'])
+            plan[j - 1], plan[j] = (name, kwargs), plan[j - 1]
+            j -= 1
+
+    # slicing before filling
+    fused = []
+    for name, kwargs in plan:
+        if name == 'slice_dataframe' and fused and fused[-1][0] == 'filling_period_index':
+            fused[-1] = ('filling_period_window', dict(start=kwargs['start'], stop=kwargs['stop']))
+        else:
+            fused.append((name, kwargs))
+    return fused
+
+def fill_entities(df, by, run, keys, first, last):
+    """Utility function to reindex a long *df*, sorted by entity then period,
+    so that entity *e* covers every period from *first[e]* to *last[e]*.
+
+    *run* gives the entity of each row and *keys* the value of *by* for each
+    entity. Entities with *last* before *first* are dropped."""
+
+    ordinals = df.index.asi8
+    sizes = np.maximum(last - first + 1, 0)
+    offsets = np.r_[0, np.cumsum(sizes)[:-1]].astype(int)
+
+    # position of every existing row in the filled frame
+    indexer = np.full(sizes.sum(), -1)
+    indexer[offsets[run] + ordinals - first[run]] = np.arange(len(df))
+
+    filled = df.reset_index(drop=True).reindex(indexer)
+    filled[by] = keys.repeat(sizes).array
+    new_ordinals = np.repeat(first - offsets, sizes) + np.arange(sizes.sum())
+    filled.index = ordinals_to_index(new_ordinals, freq=df.index.freq, name=df.index.name)
+    return filled
+
+def apply_by_entity(df, by, func):
+    """Utility function to run an ungrouped step *func* on each entity of *df*
+    separately, for steps that have no grouped counterpart."""
+
+    results = [func(group.drop(columns=by)).assign(**{by: key})
+                    for key, group in df.groupby(by, sort=True, observed=True)]
+    return pd.concat(results)
 
 class DataframeTransformer(Piper, DataframeCustomMethods):
-    def __init__(self, steps):
+    """Pipeline of `DataframeCustomMethods` steps given as (name, kwargs) pairs.
+
+    Calling it on a `DataFrame` runs the steps in sequence. Passing *by* runs
+    the grouped mode instead: *df* holds many entities told apart by the column
+    *by*, and each step is run once over all of them with its
+    `GroupedDataframeMethods` counterpart (or entity by entity when there is
+    none).
+
+    With a *cache* (a `resources.processing.cache.StepCache`) the result of
+    every step is memoized under a key chained from a hash of the input frame
+    and the names, kwargs and code of the steps so far. A later call resumes
+    from the deepest step already cached, so changing only a late step reuses
+    all the upstream results.
+
+    With a *profiler* (a `resources.processing.profiling.StepProfiler`) every
+    step that actually runs is timed and measured; without one the steps run
+    with no instrumentation at all.
+
+    With *lazy* set, the steps are first rewritten by `plan_steps`, which
+    moves column projections and date slices as far upstream as possible
+    while keeping the result identical. `required_columns` then tells which
+    columns the input must have, e.g. for `read_csv(usecols=...)`."""
+
+    def __init__(self, steps, cache=None, profiler=None, lazy=False):
         Piper.__init__(self, steps=steps)
+        self.cache = cache
+        self.profiler = profiler
+        self.lazy = lazy
         assert all(hasattr(self, name) for name, _ in self.steps)
-        names, kwargs_list = zip(*steps)
-        curried_functions = list(map(lambda name: curry(getattr(self, name)), names))
-        self.steps = [curried_function(**kwargs) if kwargs is not None else curried_function
-                                for curried_function, kwargs in zip(curried_functions, kwargs_list)][::-1]
-
-    def __call__(self, df):
-        pipeline = compose(*self.steps)
-        return pipeline(df)
+        self.plan = plan_steps(self.steps) if lazy else self.steps
+        self.names, self.kwargs_list = map(list, zip(*self.plan))
+
+        # compiling: step arguments are bound and checked once, here
+        self.steps = self._compile()
+        self._grouped_steps = {}
+
+    def __call__(self, df, by=None):
+        steps = self.steps if by is None else self._compile_grouped(by)
+        if self.cache is not None:
+            return self._call_cached(df, steps, by)
+        if self.profiler is not None:
+            return self._call_profiled(df, steps)
+
+        for step in steps:
+            df = step(df)
+        return df
+
+    def required_columns(self, by=None):
+        """Return the input columns the pipeline reads, or None if it may read
+        any of them. Only a lazy plan starting with a projection knows it."""
+
+        name, kwargs = self.plan[0]
+        if name != 'select_features':
+            return None
+        columns = list(kwargs['features'])
+        return columns if by is None or by in columns else [by] + columns
+
+    def _call_profiled(self, df, steps):
+        for i in range(len(steps)):
+            df = self.profiler.run(i, self.names[i], steps[i], df)
+        return df
+
+    def _compile(self):
+        return [self._bind(getattr(self, name), name, kwargs)
+                    for name, kwargs in zip(self.names, self.kwargs_list)]
+
+    def _compile_grouped(self, by):
+        if by not in self._grouped_steps:
+            steps = []
+            for name, kwargs in zip(self.names, self.kwargs_list):
+                grouped_step = getattr(GroupedDataframeMethods, name, None)
+                if grouped_step is not None:
+                    steps.append(self._bind(grouped_step, name, {'by': by, **kwargs}))
+                else:
+                    step = self._bind(getattr(self, name), name, kwargs)
+                    steps.append(partial(apply_by_entity, by=by, func=step))
+            self._grouped_steps[by] = steps
+        return self._grouped_steps[by]
+
+    @staticmethod
+    def _bind(func, name, kwargs):
+        try:
+            return bind(func, **kwargs)
+        except TypeError as error:
+            raise TypeError(f"Invalid arguments for step '{name}': {error}") from None
+
+    def _call_cached(self, df, steps, by):
+        versions = [code_fingerprint(step) for step in steps]
+        keys = step_keys(hash_frame(df), self.names, self.kwargs_list, by=by, versions=versions)
+
+        # resuming from the deepest cached step
+        start = 0
+        for i in reversed(range(len(keys))):
+            cached = self.cache.get(keys[i])
+            if cached is not MISSING:
+                df, start = cached, i + 1
+                break
+
+        for i in range(start, len(keys)):
+            df = steps[i](df) if self.profiler is None else self.profiler.run(i, self.names[i], steps[i], df)
+            self.cache.put(keys[i], df)
+        return df
     
 def missing_period(period_index):
-    full_index = pd.period_range(start=period_index[0], end=period_index[-1], freq=period_index.freq)
-    return ~len(full_index) == len(period_index)
+    """Utility function telling whether a sorted, unique *period_index* has gaps,
+    comparing its integer ordinals instead of building the full range."""
+
+    if len(period_index) == 0:
+        return False
+    ordinals = period_index.asi8
+    return ordinals[-1] - ordinals[0] + 1 != len(ordinals)
+
+def ordinals_to_index(ordinals, freq, name=None):
+    """Utility function building a `PeriodIndex` of frequency *freq* straight
+    from integer *ordinals*, without going through `Period` objects."""
+
+    values = pd.arrays.PeriodArray(np.asarray(ordinals, dtype=np.int64), dtype=pd.PeriodDtype(freq))
+    return pd.PeriodIndex(values, name=name)
+
+def period_bounds(start, stop, freq):
+    """Utility function returning the ordinals, at frequency *freq*, of the first
+    period of *start* and the last period of *stop*, as label slicing of a
+    `PeriodIndex` would bound them (e.g. 'jun-2020' starts on June 1st and
+    ends on June 30th). A None bound stays None."""
+
+    lower = None if start is None else pd.Period(start).asfreq(freq, how='start').ordinal
+    upper = None if stop is None else pd.Period(stop).asfreq(freq, how='end').ordinal
+    return lower, upper
+
+def as_reindexed(df):
+    """Utility function casting the columns of *df* to the dtypes a reindex
+    introducing missing rows would give them (integers to float, booleans
+    to object)."""
+
+    casts = {column: (np.float64 if dtype.kind in 'iu' else object)
+                for column, dtype in df.dtypes.items() if isinstance(dtype, np.dtype) and dtype.kind in 'iub'}
+    return df.astype(casts) if casts else df
+
+def parse_dates(dates, date_format=None):
+    """Utility function to parse a column of dates in a single vectorized pass.
+
+    Integer dates in the `yyyymmdd` layout used by the covid-tracking API are
+    split arithmetically. Other values are parsed by `pd.to_datetime` with
+    *date_format*, or with the format guessed from the first value, so that it
+    is not re-inferred row by row."""
+
+    if pd.api.types.is_integer_dtype(dates) and date_format is None:
+        values = dates.to_numpy()
+        return pd.to_datetime(pd.DataFrame({'year': values // 10000,
+                                            'month': values // 100 % 100,
+                                            'day': values % 100}))
+
+    if date_format is None and len(dates) and isinstance(dates.iloc[0], str):
+        date_format = guess_datetime_format(dates.iloc[0])
+    return pd.to_datetime(dates, format=date_format)
+
+def infer_period_freq(dates):
+    """Utility function to infer the period frequency of parsed *dates* from
+    the smallest gap between distinct values: daily, weekly or monthly."""
+
+    unique = np.unique(dates.to_numpy(dtype='datetime64[D]'))
+    if len(unique) < 2:
+        return 'D'
+
+    step = np.diff(unique).min().astype(int)
+    if step >= 28:
+        return 'M'
+    elif step >= 7:
+        return 'W'
+    return 'D'
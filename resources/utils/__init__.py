@@ -1 +1,2 @@
-from .functk import compose, curry
\ No newline at end of file
+from .functk import bind, compose, curry
+from .lazy import lazy_exports
@@ -51,26 +51,18 @@ def curry(func):
     > 7
     """
 
-    def curried(*args, func=func, **kwargs):
-        # dictionary of <param>:<default value>
-        func_params = signature(func).parameters 
+    # the signature is inspected once, not at every partial application
+    func_params = signature(func).parameters
+    required = {name for name, param in func_params.items() if param.default is param.empty}
 
-        # a dictionary of parameters in *func_parame* set as kwargs
-        kwargs_func = dict(filter(lambda x: x[1].default != x[1].empty, func_params.items()))
+    def curried(*args, **kwargs):
+        # counting parameters feed to the function (positional + unset kwargs)
+        n_args_input = len(args) + len(set(kwargs.keys()) & required)
 
-        # counting the unset parameters in * func_params*
-        n_args_remaining = len(func_params) - len(kwargs_func)
-
-        # count positional parameters feed to the function
-        n_args_input = len(args) 
-        # count parameters set as kwargs
-        n_kwargs_input = len(set(kwargs.keys()) - set(kwargs_func.keys()))
-
-        if n_args_remaining <= n_args_input + n_kwargs_input:
+        if len(required) <= n_args_input:
             return func(*args, **kwargs)
         else:
-            func = partial(func, *args, **kwargs)
-            return curry(func)
+            return partial(curried, *args, **kwargs)
     return curried
 
 def compose(*functions):
@@ -104,12 +96,55 @@ def compose(*functions):
     > [12, 14, 16]
     """
 
-    def composed(functions, arg):
-        # runs through every function until the last in the sequence.
-        if len(functions) == 1:
-            return functions[0](arg)
-        else:
-            func = functions[-1]
+    # runs through every function, from the last in the sequence to the first.
+    pipeline = functions[::-1]
+
+    def composed(arg):
+        for func in pipeline:
             arg = func(arg)
-            return composed(functions[:-1], arg)
-    return partial(composed, functions)
\ No newline at end of file
+        return arg
+    return composed
+
+def bind(*args, **kwargs):
+    """This function binds *kwargs* to *func* once and for all.
+
+    The arguments are checked against the signature of *func* up front:
+    unknown keywords, or parameters other than the first one that are
+    left without a value, raise a `TypeError` here instead of at call
+    time. The returned function only takes the remaining first argument.
+
+    Parameters
+    ----------
+
+    func:
+        An ordinary python function whose first parameter is the input.
+    kwargs:
+        Values for every other parameter without a default.
+
+    Returns
+    -------
+        A function of a single argument.
+
+    Exemple
+    -------
+
+    def scale(x, factor, offset=0): return x * factor + offset
+
+    double = bind(scale, factor=2)
+    double(4)
+    > 8
+
+    bind(scale, offset=1)
+    > TypeError: missing a required argument: 'factor'
+    """
+
+    # *func* is positional only, so that it never clashes with a keyword of
+    # the same name (e.g. the `func` parameter of the `apply_func` step)
+    if len(args) != 1:
+        raise TypeError(f'bind() takes exactly one positional argument ({len(args)} given)')
+    func = args[0]
+
+    params = list(signature(func).parameters.values())
+    # binding a placeholder for the input validates all the other arguments
+    signature(func).bind(*([None] if params else []), **kwargs)
+    return partial(func, **kwargs)
\ No newline at end of file
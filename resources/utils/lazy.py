@@ -0,0 +1,32 @@
+"""This module implements lazy attribute loading for packages, so importing them does not import their dependencies."""
+
+import importlib
+
+def lazy_exports(package, exports={}, submodules=()):
+    """Utility function returning the module-level `__getattr__` and `__dir__`
+    (PEP 562) of *package*, which import each public name of *exports* (a dict
+    mapping names to the submodules defining them) and each of *submodules*
+    on first access only.
+
+    Usage, in the package's `__init__.py`:
+
+        __getattr__, __dir__ = lazy_exports(__name__, {'ApiManager': 'api_manager'})
+    """
+
+    module = importlib.import_module(package)
+
+    def __getattr__(name):
+        if name in submodules:
+            # importing a submodule binds it in its package already
+            return importlib.import_module(f'{package}.{name}')
+        if name not in exports:
+            raise AttributeError(f'module {package!r} has no attribute {name!r}')
+        value = getattr(importlib.import_module(f'{package}.{exports[name]}'), name)
+        # caching it, later lookups do not go through __getattr__
+        setattr(module, name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(module)) | set(exports) | set(submodules))
+
+    return __getattr__, __dir__
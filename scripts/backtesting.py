@@ -0,0 +1,112 @@
+"""This script backtests the model from rolling forecast origins."""
+
+from resources.processing import DataframeTransformer, StepCache, lag_matrix
+from resources.modeling.backtest import backtest, rolling_origins
+from sklearn.base import clone
+import pandas as pd
+import argparse
+import joblib
+import os
+
+# configurando input do script
+parser = argparse.ArgumentParser(description="Backtest the model from rolling forecast origins.")
+
+parser.add_argument('-d', '--directory',
+                type=str,
+                dest='path',
+                default='./data',
+                help='Directory where to look for the model and to dump the results.')
+
+parser.add_argument('--start',
+                type=str,
+                dest='start',
+                default='sep-2020',
+                help='First forecast origin.')
+
+parser.add_argument('--stop',
+                type=str,
+                dest='stop',
+                default=None,
+                help='Last period of data used (default: all of it).')
+
+parser.add_argument('--step',
+                type=int,
+                dest='step',
+                default=7,
+                help='Days between forecast origins.')
+
+parser.add_argument('--horizon',
+                type=int,
+                dest='horizon',
+                default=30,
+                help='Days scored after each origin.')
+
+parser.add_argument('--refit-every',
+                type=int,
+                dest='refit_every',
+                default=1,
+                help='Refit the model every N origins, reusing the last fit in between.')
+
+parser.add_argument('--lags',
+                type=str,
+                nargs='+',
+                dest='lags',
+                default=['positiveIncrease=31', 'hospitalizedIncrease=10'],
+                metavar='FEATURE=LAG[,LAG...]',
+                help='Lags (in days) of each feature.')
+
+parser.add_argument('--cache',
+                type=str,
+                dest='cache',
+                default=None,
+                help='Directory for caching the results of each processing step between runs.')
+
+parser.add_argument('-j', '--jobs',
+                type=int,
+                dest='jobs',
+                default=-1,
+                help='Number of processes smoothing the series and running the origins (-1 for all cores).')
+
+parser.add_argument('--keep',
+                action='store_true',
+                dest='keep',
+                help='Flag the script to not dump the results.')
+
+args = parser.parse_args()
+assert os.path.exists(args.path)
+
+print('[BACKTESTING] Starting process...')
+
+# o modelo treinado define o estimador (hiperparâmetros), reajustado em cada origem
+estimator = clone(joblib.load(os.path.join(args.path, 'model.pkl')))
+
+lags = {}
+for item in args.lags:
+    feature, _, values = item.partition('=')
+    values = [int(value) for value in values.split(',')]
+    lags[feature] = values[0] if len(values) == 1 else values
+target = ['deathIncrease']
+
+# as séries são suavizadas uma única vez e compartilhadas por todas as origens
+steps = [('convert_date_to_index', None),
+         ('filling_period_index', None),
+         ('select_features', dict(features=list(lags) + target)),
+         ('slice_dataframe', dict(start='jun-2020', stop=args.stop)),
+         ('smoothen', dict(period=7, seasonal=7, n_jobs=args.jobs))]
+cache = StepCache(args.cache) if args.cache is not None else None
+df = DataframeTransformer(steps=steps, cache=cache, lazy=True)(pd.read_pickle('./data/dataframes/us_historical.pkl'))
+dataset = lag_matrix(df, lags).join(df[target])
+
+origins = rolling_origins(dataset.index, args.start, step=args.step, horizon=args.horizon)
+print('[BACKTESTING] Evaluating %d origins...'%len(origins))
+results = backtest(estimator, dataset, target[0], origins, horizon=args.horizon,
+                   refit_every=args.refit_every, n_jobs=args.jobs)
+
+print('[BACKTESTING] Finished process.')
+print('-'*50)
+print(results.to_string(float_format='%.3f'))
+print('-'*50, '\n')
+
+if not args.keep:
+    results.to_csv(os.path.join(args.path, 'backtest.csv'))
+    print('Results dumped.\n')
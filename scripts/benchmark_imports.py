@@ -0,0 +1,91 @@
+"""This script benchmarks the import time of the resources package and checks it against a budget."""
+
+import subprocess
+import argparse
+import sys
+import os
+
+# tempo máximo (ms, além do interpretador) e módulos pesados proibidos de cada import
+HEAVY = ['statsmodels', 'sklearn', 'joblib', 'requests', 'yaml', 'aiohttp', 'pyarrow', 'matplotlib']
+BUDGETS = [('import resources', 30, HEAVY + ['pandas', 'numpy']),
+           ('import resources.io', 30, HEAVY + ['pandas', 'numpy']),
+           ('import resources.processing', 30, HEAVY + ['pandas', 'numpy']),
+           ('import resources.modeling', 30, HEAVY + ['pandas', 'numpy']),
+           ('from resources.modeling.inference import load_model', 250, HEAVY + ['pandas']),
+           ('from resources.modeling.evaluation import evaluate_stages', 250, HEAVY + ['pandas']),
+           ('from resources.processing import lag_matrix', 1000, ['statsmodels', 'sklearn', 'joblib', 'requests',
+                                                                 'yaml', 'aiohttp', 'matplotlib']),
+           ('from resources.processing import DataframeTransformer', 1000, ['statsmodels', 'sklearn', 'joblib',
+                                                                            'requests', 'yaml', 'aiohttp',
+                                                                            'matplotlib'])]
+
+# configurando input do script
+parser = argparse.ArgumentParser(description="Measure cold import times (python -X importtime) against a budget.")
+
+parser.add_argument('-n', '--repeat',
+                type=int,
+                dest='repeat',
+                default=5,
+                help='Fresh interpreters per statement (the fastest one is kept).')
+
+parser.add_argument('--scale',
+                type=float,
+                dest='scale',
+                default=1.,
+                help='Multiply every time budget (for slower machines).')
+
+parser.add_argument('--top',
+                type=int,
+                dest='top',
+                default=5,
+                help='Number of slowest modules printed for each statement.')
+
+args = parser.parse_args()
+
+def import_times(statement):
+    """Run *statement* in a fresh interpreter and return {module: (cumulative
+    time in ms, top-level import)} parsed from its -X importtime output."""
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.environ.get('PYTHONPATH')])))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], env=env,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(cumulative) / 1e3, not name[1:].startswith(' '))
+    return times
+
+def measure(statement, baseline):
+    """Return the fastest import time (ms) of *statement* out of `args.repeat`
+    runs, leaving out the modules the interpreter imports on its own, and the
+    modules imported by that run."""
+
+    best = None
+    for _ in range(args.repeat):
+        times = {name: value for name, value in import_times(statement).items() if name not in baseline}
+        total = sum(cumulative for cumulative, top_level in times.values() if top_level)
+        if best is None or total < best[0]:
+            best = (total, times)
+    return best
+
+baseline = set(import_times('pass'))
+violations = 0
+print('-'*50)
+for statement, budget, forbidden in BUDGETS:
+    total, times = measure(statement, baseline)
+    budget *= args.scale
+    heavy = sorted({name.split('.')[0] for name in times} & set(forbidden))
+    ok = total <= budget and not heavy
+    violations += not ok
+    print('[%s] %-60s %8.1f ms (budget %.0f ms)'%('OK' if ok else 'FAIL', statement, total, budget))
+    if heavy:
+        print('       heavy modules imported: %s'%', '.join(heavy))
+    for name, (cumulative, _) in sorted(times.items(), key=lambda item: -item[1][0])[:args.top]:
+        print('       %8.1f ms  %s'%(cumulative, name))
+print('-'*50, '\n')
+
+if violations:
+    print('%d import(s) over budget.\n'%violations)
+    sys.exit(1)
@@ -0,0 +1,77 @@
+"""This script benchmarks the inference of the trained model."""
+
+from resources.modeling import ModelServer, load_model
+import numpy as np
+import argparse
+import joblib
+import time
+import os
+
+# configurando input do script
+parser = argparse.ArgumentParser(description="Benchmark throughput and latency of the trained model.")
+
+parser.add_argument('-d', '--directory',
+                type=str,
+                dest='path',
+                default='./data',
+                help='Directory where to look for model and test set.')
+
+parser.add_argument('-n', '--requests',
+                type=int,
+                dest='requests',
+                default=2000,
+                help='Number of single-row requests timed for latency.')
+
+parser.add_argument('--batch-sizes',
+                type=int,
+                nargs='+',
+                dest='batch_sizes',
+                default=[1, 32, 1024, 32768],
+                help='Batch sizes timed for throughput.')
+
+parser.add_argument('--no-compile',
+                action='store_true',
+                dest='no_compile',
+                help='Serve the model through its own predict method.')
+
+args = parser.parse_args()
+assert os.path.exists(args.path)
+
+model_path = os.path.join(args.path, 'model.pkl')
+test_set = np.load(os.path.join(args.path, 'test_set.npy'))
+X_test = test_set[:, :-1]
+rng = np.random.default_rng(0)
+
+def timed(func, *func_args):
+    start = time.perf_counter()
+    result = func(*func_args)
+    return time.perf_counter() - start, result
+
+# carregando o modelo
+load_time, _ = timed(joblib.load, model_path)
+cached_time, _ = timed(load_model, model_path)
+cached_time, _ = timed(load_model, model_path)
+server = ModelServer(model_path, compile=not args.no_compile)
+print('-'*50)
+print('Model: %s (%s)'%(model_path, 'compiled' if server.compiled is not None else 'predict'))
+print('Load time: %.2f ms (cached: %.4f ms)'%(load_time * 1e3, cached_time * 1e3))
+
+# latência por requisição de uma linha
+rows = X_test[rng.integers(len(X_test), size=args.requests)]
+latencies = np.empty(args.requests)
+for i, row in enumerate(rows):
+    latencies[i], _ = timed(server.predict, row)
+p50, p99 = np.percentile(latencies, [50, 99]) * 1e3
+print('Single-row latency: p50 %.4f ms, p99 %.4f ms'%(p50, p99))
+
+stream_time, _ = timed(lambda: list(server.predict_stream(rows)))
+print('Stream throughput: %.0f rows/s'%(len(rows) / stream_time))
+
+# vazão por tamanho de lote
+for batch_size in args.batch_sizes:
+    batch = X_test[rng.integers(len(X_test), size=batch_size)]
+    n_calls = max(1, min(100, 100000 // batch_size))
+    batch_time, _ = timed(lambda: [server.predict(batch) for _ in range(n_calls)])
+    print('Batch %6d: %10.0f rows/s, %.4f ms per batch'%(batch_size, batch_size * n_calls / batch_time,
+                                                        batch_time / n_calls * 1e3))
+print('-'*50, '\n')
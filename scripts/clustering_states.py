@@ -0,0 +1,136 @@
+"""This script clusters the states by their smoothed death rate series."""
+
+from resources.modeling.clustering import SeriesClusterer
+from resources.processing.smoothing import stl_many
+import pandas as pd
+import numpy as np
+import argparse
+import pickle
+import os
+
+# configurando input do script
+parser = argparse.ArgumentParser(description="Cluster the states (PCA + KMeans) by their death rate series.")
+parser.add_argument('-i', '--input',
+                type=str,
+                dest='input',
+                default='./data/dataframes/all_states.pkl',
+                help='The states dataframe dumped by processing_data_by_states.py.')
+
+parser.add_argument('-o', '--output',
+                dest='output',
+                default='./data/dataframes',
+                help='Output directory for dumping the clusters.')
+
+parser.add_argument('--file',
+                dest='file',
+                default='states_clusters.pkl',
+                help='Filename for dumping the clusters.')
+
+parser.add_argument('--components',
+                type=int,
+                dest='components',
+                default=4,
+                help='Number of principal components.')
+
+parser.add_argument('--max-clusters',
+                type=int,
+                dest='max_clusters',
+                default=10,
+                help='Largest number of clusters of the sweep.')
+
+parser.add_argument('--clusters',
+                type=int,
+                dest='clusters',
+                default=None,
+                help='Number of clusters chosen (default: the highest silhouette).')
+
+parser.add_argument('--n-init',
+                type=int,
+                dest='n_init',
+                default=30,
+                help='KMeans restarts for each number of clusters.')
+
+parser.add_argument('--solver',
+                type=str,
+                dest='solver',
+                choices=['randomized', 'incremental'],
+                default='randomized',
+                help='PCA solver (incremental processes the series in batches).')
+
+parser.add_argument('--silhouette-sample',
+                type=int,
+                dest='silhouette_sample',
+                default=None,
+                help='Number of series sampled for the silhouette.')
+
+parser.add_argument('--state',
+                type=str,
+                dest='state',
+                default=None,
+                help='File keeping the fitted clusterer, for later updates.')
+
+parser.add_argument('--update',
+                action='store_true',
+                dest='update',
+                help='Add the new days to the clusterer saved in --state instead of fitting it again.')
+
+parser.add_argument('-j', '--jobs',
+                type=int,
+                dest='jobs',
+                default=-1,
+                help='Number of processes (-1 for all cores).')
+
+parser.add_argument('--random-state',
+                type=int,
+                dest='random_state',
+                default=1511,
+                help='Set random state for reproducible results.')
+
+args = parser.parse_args()
+assert os.path.exists(args.input)
+assert os.path.exists(args.output)
+assert not args.update or (args.state is not None and os.path.exists(args.state))
+
+def fill_missing_days(values):
+    """Utility function to interpolate the days missing inside a series, and
+    count the days before its first or after its last record (NaN padded by
+    the grouped pipeline) as no deaths, since STL does not accept NaN."""
+
+    return pd.Series(values, dtype=np.float64).interpolate(limit_area='inside').fillna(0).to_numpy()
+
+# taxa de mortes suavizada (por 100 mil habitantes), como no notebook de EDA
+all_states = pd.read_pickle(args.input).set_index('state')
+series = [fill_missing_days(values) for values in all_states['deathIncrease']]
+trend = stl_many(series, period=7, seasonal=5, n_jobs=args.jobs)
+data = pd.DataFrame(np.vstack(trend) / all_states['population'].to_numpy()[:, None] * 1e5, index=all_states.index)
+
+if args.update:
+    with open(args.state, 'rb') as state_file:
+        clusterer = pickle.load(state_file)
+    assert list(clusterer.index_) == list(data.index), 'The states changed, fit the clusterer again.'
+    n_days = len(clusterer.mean_)
+    print('[CLUSTERING] Adding %d new days...'%(data.shape[1] - n_days))
+    if data.shape[1] > n_days:
+        clusterer.update(data.iloc[:, n_days:])
+    labels = clusterer.recluster(args.clusters)
+else:
+    print('[CLUSTERING] Fitting %d series...'%len(data))
+    clusterer = SeriesClusterer(n_components=args.components, k_range=range(1, args.max_clusters + 1),
+                                n_init=args.n_init, solver=args.solver, silhouette_sample=args.silhouette_sample,
+                                n_jobs=args.jobs, random_state=args.random_state).fit(data)
+    labels = clusterer.labels(args.clusters)
+
+print('-'*50)
+if not args.update:
+    print(clusterer.sweep_.to_string(float_format='%.3f'))
+print('Explained variance: %.3f'%clusterer.explained_variance_ratio_.sum())
+print('Clusters: %s'%labels.value_counts().sort_index().to_dict())
+print('-'*50, '\n')
+
+# dumping clusters e projeções
+output = os.path.join(args.output, args.file)
+clusterer.projections().assign(cluster=labels).to_pickle(output)
+if args.state is not None:
+    with open(args.state, 'wb') as state_file:
+        pickle.dump(clusterer, state_file)
+print('Clusters dumped at %s.\n'%output)
@@ -1,10 +1,11 @@
 """This script builds the traning and test sets."""
 
-from resources.processing import DataframeTransformer
-from statsmodels.tsa.api import ExponentialSmoothing
-from resources.utils import curry
+from resources.processing import DataframeTransformer, StepCache, lag_matrix, lag_correlations, best_lags
+from resources.processing.smoothing import stl_search, best_stl_params
+from resources.io.arrays import write_rows, open_rows
 import pandas as pd
 import numpy as np
+import json
 import os
 import argparse
 
@@ -21,8 +22,58 @@ parser.add_argument('--keep',
                 dest='keep',
                 help='Flag the script to not dump the files.')
 
+parser.add_argument('--cache',
+                type=str,
+                dest='cache',
+                default=None,
+                help='Directory for caching the results of each processing step between runs.')
+
+parser.add_argument('-j', '--jobs',
+                type=int,
+                dest='jobs',
+                default=1,
+                help='Number of processes fitting STL smoothing (-1 for all cores).')
+
+parser.add_argument('--stop',
+                type=str,
+                dest='stop',
+                default='dec-2020',
+                help='Last period of data used in the sets.')
+
+parser.add_argument('--incremental',
+                action='store_true',
+                dest='incremental',
+                help='Only process the dates that arrived since the last build and append them to the sets.')
+
+parser.add_argument('--context',
+                type=int,
+                dest='context',
+                default=60,
+                help='Days of smoothed data recomputed before the last build date in incremental mode.')
+
+parser.add_argument('--lags',
+                type=str,
+                nargs='+',
+                dest='lags',
+                default=None,
+                metavar='FEATURE=LAG[,LAG...]',
+                help='Lags (in days) of each feature, e.g. positiveIncrease=31 hospitalizedIncrease=7,10.')
+
+parser.add_argument('--search-lags',
+                type=int,
+                dest='search_lags',
+                default=None,
+                metavar='MAX_LAG',
+                help='Use the lag of highest correlation with the target (up to MAX_LAG days) of each feature.')
+
+parser.add_argument('--search-stl',
+                action='store_true',
+                dest='search_stl',
+                help='Choose the STL period, seasonal window and robustness by a grid search.')
+
 args = parser.parse_args()
 assert os.path.exists(args.path)
+assert args.context > 0
 
 print('[BUILDING DATASETS] Starting process...')
 
@@ -32,32 +83,149 @@ input_df = pd.read_pickle('./data/dataframes/us_historical.pkl')
 # Preparando transformações
 features = ['positiveIncrease', 'hospitalizedIncrease']
 target = ['deathIncrease']
+default_lags = {'positiveIncrease': 31, 'hospitalizedIncrease': 10}
+test_period = 'dec-2020'
+start = 'jun-2020'
+stl_params = dict(period=7, seasonal=7)
 steps = [('convert_date_to_index', None),
          ('filling_period_index', None),
          ('select_features', dict(features=features + target)),
-         ('slice_dataframe', dict(start='jun-2020', stop='dec-2020')),
-         ('smoothen', dict(period=7, seasonal=7))]
+         ('slice_dataframe', dict(start=start, stop=args.stop))]
 
-print('[BUILDING DATASETS] Applying transformations...')
-pipeline = DataframeTransformer(steps=steps)
-df = pipeline(input_df)
+paths = {name: os.path.join(args.path, f'{name}.npy') for name in ('training_set', 'test_set', 'smoothed')}
+state_path = os.path.join(args.path, 'datasets_state.json')
 
-# Preparando dataset
-test_period = 'dec-2020'
-positiveIncrease_shift = 31
-hospitalizedIncrease_shift = 10
-dataset = df.apply({'positiveIncrease': lambda col: col.shift(positiveIncrease_shift),
-            'hospitalizedIncrease': lambda col: col.shift(hospitalizedIncrease_shift)}).dropna()
+def parse_lags(items):
+    lags = {}
+    for item in items:
+        feature, _, values = item.partition('=')
+        assert feature in features and values, f'Invalid lags: {item}'
+        values = [int(value) for value in values.split(',')]
+        lags[feature] = values[0] if len(values) == 1 else values
+    return lags
+
+def build_dataset(df):
+    """Lags the smoothed features and joins the target, one row per date."""
+
+    return lag_matrix(df, lags).join(df[target])
+
+def save_state(state):
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(state, file, indent=2)
+    os.replace(tmp_path, state_path)
+
+def discard_state():
+    # the arrays are about to change: an interrupted run leaves no state, so the next one rebuilds everything
+    if os.path.isfile(state_path):
+        os.remove(state_path)
+
+def load_state():
+    # searching lags or STL parameters may change them, which always needs a full build
+    searching = args.search_lags is not None or args.search_stl
+    if not (args.incremental and not searching and os.path.isfile(state_path)):
+        return None
+    with open(state_path) as file:
+        return json.load(file)
+
+state = load_state()
+if args.lags is not None:
+    lags = parse_lags(args.lags)
+elif state is not None:
+    lags = state['params']['lags']
+else:
+    lags = default_lags
+if state is not None:
+    stl_params = state['params']['stl_params']
+
+# anything that changes the rows already written forces a full build
+params = dict(features=features, target=target, lags=lags, test_period=test_period,
+              start=start, stl_params=stl_params, context=args.context)
+if state is not None and (state['params'] != params or not all(os.path.isfile(path) for path in paths.values())):
+    print('[BUILDING DATASETS] Previous build is not compatible, rebuilding everything...')
+    state = None
+
+cache = StepCache(args.cache) if args.cache is not None else None
+
+if args.search_stl:
+    print('[BUILDING DATASETS] Searching STL parameters...')
+    raw = DataframeTransformer(steps=steps, cache=cache, lazy=True)(input_df)
+    raw = raw[~(raw.index > test_period)]
+    results = stl_search([raw[column] for column in raw.columns], periods=range(3, 20), seasonals=range(5, 16, 2),
+                         robust=(False, True), n_jobs=args.jobs)
+    stl_params = params['stl_params'] = best_stl_params(results)
+    print('[BUILDING DATASETS] STL parameters: %s'%stl_params)
+smoothing = ('smoothen', dict(**stl_params, n_jobs=args.jobs))
+
+if state is None:
+    print('[BUILDING DATASETS] Applying transformations...')
+    pipeline = DataframeTransformer(steps=steps + [smoothing], cache=cache, lazy=True)
+    df = pipeline(input_df)
+
+    if args.search_lags is not None:
+        # only the training period is looked at, the test set must not choose the lags
+        correlations = lag_correlations(df[~(df.index > test_period)], features, target, args.search_lags)
+        lags = params['lags'] = best_lags(correlations)
+        for feature, lag in lags.items():
+            print(f'[BUILDING DATASETS] {feature}: lag {lag} (correlation {correlations.loc[lag, feature]:.3f})')
+
+    dataset = build_dataset(df)
+    filter_period = dataset.index > test_period
+    # C order, so that incremental builds can append rows in place
+    training_set = np.ascontiguousarray(dataset[~filter_period].values)
+    test_set = np.ascontiguousarray(dataset[filter_period].values)
+
+    print('[BUILDING DATASETS] Finished process.')
+
+    if not args.keep:
+        discard_state()
+        np.save(paths['training_set'], training_set)
+        np.save(paths['test_set'], test_set)
+        np.save(paths['smoothed'], np.ascontiguousarray(df[features + target].values))
+        state = dict(params=params, first_date=str(df.index[0]), last_date=str(df.index[-1]),
+                     first_test_date=str(dataset.index[filter_period][0]) if filter_period.any() else None)
+        save_state(state)
+        print('Files dumped.\n')
+else:
+    print('[BUILDING DATASETS] Applying transformations to new dates...')
+    raw = DataframeTransformer(steps=steps, cache=cache, lazy=True)(input_df)
+    first_date, last_date = pd.Period(state['first_date'], 'D'), pd.Period(state['last_date'], 'D')
+    if raw.index[-1] <= last_date:
+        print('[BUILDING DATASETS] Sets are up to date.\n')
+        raise SystemExit
+
+    # STL estimates near the end of a series change as new points arrive, so
+    # the last *context* days are smoothed again, fitted over twice as many
+    # days so that the start of the refit window has no edge effects either
+    affected = max(last_date - args.context + 1, first_date)
+    fitted = DataframeTransformer(steps=[smoothing])(raw.loc[max(affected - args.context, raw.index[0]):])
+    fitted = fitted.loc[affected:, features + target]
 
+    if not args.keep:
+        discard_state()
+        write_rows(paths['smoothed'], fitted.values, start=affected.ordinal - first_date.ordinal)
 
-dataset = dataset.join(df[target])
-filter_period = dataset.index > test_period
-training_set = dataset[~filter_period].values
-test_set = dataset[filter_period].values
+        # rows from *affected* on depend on the refitted values, earlier lags are read back
+        max_shift = int(max(np.max(lag) for lag in lags.values()))
+        window_start = max(affected - max_shift, first_date)
+        smoothed = open_rows(paths['smoothed'])[window_start.ordinal - first_date.ordinal:]
+        window = pd.DataFrame(np.array(smoothed), columns=features + target,
+                              index=pd.period_range(window_start, periods=len(smoothed), freq='D'))
+        dataset = build_dataset(window).loc[affected:]
 
-print('[BUILDING DATASETS] Finished process.')
+        filter_period = dataset.index > test_period
+        first_row_date = first_date + max_shift
+        if (~filter_period).any():
+            write_rows(paths['training_set'], dataset[~filter_period].values,
+                       start=dataset.index[0].ordinal - first_row_date.ordinal)
+        if filter_period.any():
+            first_test_date = pd.Period(state['first_test_date'] or dataset.index[filter_period][0], 'D')
+            write_rows(paths['test_set'], dataset[filter_period].values,
+                       start=dataset.index[filter_period][0].ordinal - first_test_date.ordinal)
+            state['first_test_date'] = str(first_test_date)
 
-if not args.keep:
-    np.save(os.path.join(args.path, 'training_set.npy'), training_set)
-    np.save(os.path.join(args.path, 'test_set.npy'), test_set)
-    print('Files dumped.\n')
\ No newline at end of file
+        state['last_date'] = str(fitted.index[-1])
+        save_state(state)
+        print(f'[BUILDING DATASETS] Appended {fitted.index[-1].ordinal - last_date.ordinal} new dates.\n')
+    else:
+        print('[BUILDING DATASETS] Finished process.')
\ No newline at end of file
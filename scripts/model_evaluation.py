@@ -4,7 +4,7 @@ import os
 import joblib
 import numpy as np
 import argparse
-import sklearn.metrics as metrics
+from resources.modeling.evaluation import evaluate_stages, STAGED_METRICS
 
 # configurando input do script
 parser = argparse.ArgumentParser(description="Evaluate a trained model in the test set.")
@@ -24,7 +24,7 @@ parser.add_argument('--metric',
 parser.add_argument('--boosting-steps',
                 action='store_true',
                 dest='boosting_steps',
-                help='Dump the evaluation metric for each boosting step.')
+                help='Dump the evaluation metrics for each boosting step.')
 
 parser.add_argument('--dry',
                 action='store_true',
@@ -35,8 +35,12 @@ parser.add_argument('--dry',
 args = parser.parse_args()
 assert os.path.exists(args.path)
 
-# Setting metric for evaluation
-eval_metric = getattr(metrics, args.metric)
+# Setting metric for evaluation (scikit-learn is only imported for its own metrics)
+if args.metric in STAGED_METRICS:
+    eval_metric = STAGED_METRICS[args.metric]
+else:
+    import sklearn.metrics as metrics
+    eval_metric = getattr(metrics, args.metric)
 print('Evaluation metric: %s'%args.metric)
 
 # loading test set
@@ -61,7 +65,9 @@ if not args.dry_run:
     print('Predictions on test set saved.')
 
 if args.boosting_steps and not args.dry_run:
-    y_preds = model.staged_predict(X_test)
-    eval_steps = map(lambda y: eval_metric(y_test, y), y_preds)
-    np.save(os.path.join(args.path, 'eval_boosting_steps.npy'), list(eval_steps))
+    # todas as métricas de todas as iterações numa única passada
+    step_metrics = list(STAGED_METRICS) + ([args.metric] if args.metric not in STAGED_METRICS else [])
+    eval_steps = evaluate_stages(model, X_test, y_test, metrics=step_metrics)
+    np.save(os.path.join(args.path, 'eval_boosting_metrics.npy'), eval_steps)
+    np.save(os.path.join(args.path, 'eval_boosting_steps.npy'), eval_steps[args.metric])
     print('Evaluated boosting iterations (steps) saved.')
\ No newline at end of file
@@ -1,7 +1,7 @@
 """This script prepares the data for clustering."""
 
 from resources.io import ApiManager, make_config
-from resources.processing import DataframeTransformer
+from resources.processing import DataframeTransformer, StepCache
 import pandas as pd
 import os
 import pickle
@@ -26,6 +26,12 @@ parser.add_argument('--file',
                 required=True,
                 help='Filename for dumping data.')
 
+parser.add_argument('--cache',
+                type=str,
+                dest='cache',
+                default=None,
+                help='Directory for caching the results of each processing step between runs.')
+
 parser.add_argument('--consume', action='store_true',
                 help='Flag for deleting files after consumed.')
 
@@ -44,14 +50,16 @@ steps = [('convert_date_to_index', None),
         ('select_features', dict(features=['state', 'deathIncrease'])),
         ('groupby_feature', dict(by='state', feature='deathIncrease', agg_func=np.array))]
 
-pipeline = DataframeTransformer(steps=steps)
+cache = StepCache(args.cache) if args.cache is not None else None
+pipeline = DataframeTransformer(steps=steps, cache=cache, lazy=True)
 
-# processing states dataframes
+# processing states dataframes (todos os estados de uma vez)
 states_list = list(covid_api.endpoints.keys())
-states_map = map(lambda state: pipeline(covid_api.retrieve(state, as_dataframe=True)), states_list)
-states_dataframe = pd.concat(list(states_map)) \
-                        .pipe(pd.DataFrame) \
-                        .reset_index()
+all_states = covid_api.retrieve_many(states_list, categories=['state'],
+                                      usecols=pipeline.required_columns(by='state'))
+states_matrix = pipeline(all_states, by='state')
+states_dataframe = pd.DataFrame({'state': states_matrix.index.astype(str),
+                                 'deathIncrease': list(states_matrix.to_numpy())})
 
 #  agregando dados de outros fontes (população e densidade)
 info_dataframe = pd.read_pickle('./data/dataframes/states_info.pkl').drop('notes', axis=1)
@@ -24,6 +24,12 @@ parser.add_argument('--file', action='store',
                 default=None,
                 help='File (+ path) to store the api object. Mandatory if export is chosen.')
 
+parser.add_argument('-w', '--workers',
+                type=int,
+                dest='workers',
+                default=8,
+                help='Number of endpoints requested concurrently.')
+
 args = parser.parse_args()
 assert args.export and args.filename is not None
 assert os.path.exists(args.base_directory)
@@ -57,8 +63,10 @@ make_config(api_name = name,
 # acessando a API
 covid_api = ApiManager(config_path,
                     base_dir=output_dir,
-                    monitor_api=True)
-covid_api.fetch(force=True)
+                    monitor_api=True,
+                    max_workers=args.workers)
+report = covid_api.fetch(force=True)
+assert not report.failed, 'Failed endpoints: %s'%', '.join(report.failed)
 
 # salvando objeto api_manager
 if args.export:
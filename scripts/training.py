@@ -8,6 +8,7 @@ from sklearn.ensemble import AdaBoostRegressor
 from sklearn.model_selection import GridSearchCV, cross_val_score, RepeatedKFold
 from sklearn.metrics import mean_squared_error, make_scorer
 from sklearn.pipeline import Pipeline
+from resources.modeling import HalvingSearch
 import joblib
 import re
 
@@ -34,6 +35,35 @@ parser.add_argument('--random-state',
                 default=42,
                 help='Set random state for reproducible cross-validation results.')
 
+parser.add_argument('--search',
+                type=str,
+                dest='search',
+                choices=['grid', 'halving'],
+                default='grid',
+                help='Exhaustive grid search or successive halving on the boosting iterations.')
+
+parser.add_argument('-j', '--jobs',
+                type=int,
+                dest='jobs',
+                default=-1,
+                help='Number of processes fitting the models (-1 for all cores).')
+
+parser.add_argument('--factor',
+                type=int,
+                dest='factor',
+                default=3,
+                help='Fraction (1/factor) of candidates kept in each round of successive halving.')
+
+parser.add_argument('--staged',
+                action='store_true',
+                dest='staged',
+                help='Also search the number of boosting iterations, scoring every one from a single fit per fold.')
+
+parser.add_argument('--checkpoint',
+                type=str,
+                dest='checkpoint',
+                default=None,
+                help='File keeping the successive halving state, so an interrupted search can be resumed (default: <directory>/search_state.json).')
 
 args = parser.parse_args()
 assert os.path.exists(args.path)
@@ -57,9 +87,19 @@ boosted_regr = AdaBoostRegressor(base_estimator=base_estimator,
 param_grid = dict([('base_estimator__alpha', alphas),
                 ('learning_rate', learning_rates)])
 
-grid_search = GridSearchCV(boosted_regr, param_grid, verbose=1,
-                    scoring=make_scorer(mean_squared_error, greater_is_better=False),
-                    cv = RepeatedKFold(n_splits=4, n_repeats=5))
+scoring = make_scorer(mean_squared_error, greater_is_better=False)
+cv = RepeatedKFold(n_splits=4, n_repeats=5, random_state=args.random_state)
+
+if args.search == 'grid' and not args.staged:
+    grid_search = GridSearchCV(boosted_regr, param_grid, verbose=1, scoring=scoring, cv=cv, n_jobs=args.jobs)
+else:
+    # candidates are first compared with few boosting iterations, only the best get all of them
+    # (a staged grid search is a single round, every candidate with every iteration)
+    grid_search = HalvingSearch(boosted_regr, param_grid, cv, scoring=scoring,
+                        factor=args.factor if args.search == 'halving' else None,
+                        staged_metric=mean_squared_error if args.staged else None,
+                        n_jobs=args.jobs, verbose=1,
+                        checkpoint=args.checkpoint or os.path.join(args.path, 'search_state.json'))
 
 # otimizando hiperparametros + treinamento do modelo final
 grid_search.fit(X_train, y_train)
@@ -0,0 +1,228 @@
+"""Tests for ApiManager against a local stand-in HTTP server."""
+
+import gzip
+import json
+import os
+import pickle
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from resources.io import ApiManager, make_config
+from resources.io.api_manager import HelperApiRetriever
+
+FILES = {'/v1/states/daily.csv': b'state,date,deaths\n' + b''.join(b'S%d,2020-01-%02d,%d\n'%(i % 7, i % 28 + 1, i)
+                                                                   for i in range(5000)),
+         '/v1/states/info.csv': b'state,name\nS0,Zero\nS1,One\n'}
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves FILES with an ETag, 304 responses to If-None-Match and Range
+    requests. Like most servers, it gzips the body for clients accepting it,
+    Range offsets then count compressed bytes. Paths listed in the server's
+    `truncate` lose their connection halfway through their next response."""
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.path not in FILES:
+            self.send_error(404)
+            return
+
+        etag = '"%x"'%hash(FILES[self.path])
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body, encoding = FILES[self.path], None
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body, encoding = gzip.compress(body, mtime=0), 'gzip'
+
+        status, first = 200, 0
+        ranged = self.headers.get('Range')
+        if ranged and self.headers.get('If-Range', etag) == etag:
+            status, first = 206, int(ranged[len('bytes='):].rstrip('-'))
+
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body) - first))
+        if encoding is not None:
+            self.send_header('Content-Encoding', encoding)
+        if status == 206:
+            self.send_header('Content-Range', 'bytes %d-%d/%d'%(first, len(body) - 1, len(body)))
+        self.end_headers()
+        if self.path in self.server.truncate:
+            self.server.truncate.remove(self.path)
+            self.wfile.write(body[first:(first + len(body)) // 2])
+            self.wfile.flush()
+            # let the client read what it got before the connection drops
+            time.sleep(.2)
+            self.close_connection = True
+            return
+        self.wfile.write(body[first:])
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    httpd.requests = []
+    httpd.truncate = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def manager(server, tmp_path):
+    config = tmp_path / 'api.yml'
+    make_config(api_name='api-test', api_domain='http://127.0.0.1:%d'%server.server_port, output_path=str(config),
+                endpoints=[{'name': 'daily', 'api': '/v1/states/daily.csv'},
+                           {'name': 'info', 'api': '/v1/states/info.csv'}])
+    return ApiManager(str(config), str(tmp_path), max_workers=2, columnar=False)
+
+def downloaded(manager, endpoint_name):
+    with open(manager.retrieve(endpoint_name), 'rb') as file:
+        return file.read()
+
+def test_fetch(manager):
+    report = manager.fetch(force=True)
+
+    assert report.failed == []
+    assert {name: record['status'] for name, record in report} == {'daily': 200, 'info': 200}
+    assert downloaded(manager, 'daily') == FILES['/v1/states/daily.csv']
+    assert downloaded(manager, 'info') == FILES['/v1/states/info.csv']
+    assert len(manager.retrieve('daily', as_dataframe=True)) == 5000
+
+def test_fetch_not_modified(manager, server):
+    manager.fetch(force=True)
+    report = manager.fetch(force=True)
+
+    assert sorted(report.not_modified) == ['daily', 'info']
+    assert all(headers.get('If-None-Match') for _, headers in server.requests[-2:])
+    assert downloaded(manager, 'daily') == FILES['/v1/states/daily.csv']
+
+    report = manager.fetch(force=True, conditional=False)
+    assert report.not_modified == []
+
+def test_fetch_resumes_part_file(manager, server):
+    manager.fetch(force=True)
+    path = manager.retrieve('daily')
+    content = FILES['/v1/states/daily.csv']
+    with open(manager.manifest_path) as file:
+        etag = json.load(file)['daily']['etag']
+
+    # an interrupted transfer: the first bytes of the file and their validator
+    os.remove(path)
+    with open(path + '.part', 'wb') as file:
+        file.write(content[:1000])
+    with open(path + '.part.json', 'w') as file:
+        json.dump({'etag': etag, 'last_modified': None}, file)
+
+    report = manager.fetch(force=True)
+
+    assert report['daily']['status'] == 206
+    assert report['daily']['resumed_from'] == 1000
+    assert report['daily']['bytes'] == len(content) - 1000
+    ranges = [headers.get('Range') for url, headers in server.requests if url == '/v1/states/daily.csv']
+    assert ranges[-1] == 'bytes=1000-'
+    assert downloaded(manager, 'daily') == content
+    assert not os.path.exists(path + '.part')
+
+def test_retrieve_many(manager):
+    manager.fetch(force=True)
+    frame = manager.retrieve_many(key='endpoint', categories=['state'])
+
+    assert len(frame) == 5002
+    assert list(frame['endpoint'].cat.categories) == ['daily', 'info']
+    assert frame['state'].dtype == 'category'
+    pd.testing.assert_series_equal(frame['deaths'].iloc[:5000].astype('int64'),
+                                   pd.Series(range(5000), name='deaths'))
+
+def test_async_fetch_resumes_part_file(manager, tmp_path):
+    pytest.importorskip('aiohttp')
+    import asyncio
+    from resources.io import AsyncApiManager
+
+    manager.fetch(force=True)
+    path = manager.retrieve('daily')
+    content = FILES['/v1/states/daily.csv']
+    os.replace(path, path + '.part')
+    with open(path + '.part', 'r+b') as file:
+        file.truncate(1000)
+
+    async_manager = AsyncApiManager(str(tmp_path / 'api.yml'), str(tmp_path), columnar=False)
+    report = asyncio.run(async_manager.fetch(force=True, chunk_size=1024))
+
+    assert report.failed == []
+    assert report['daily']['status'] == 206
+    assert report['info']['status'] == 304
+    with open(path, 'rb') as file:
+        assert file.read() == content
+
+def test_unpickle_older_manager(manager):
+    manager.fetch(force=True)
+
+    # an instance from before max_workers and columnar existed
+    older = ApiManager.__new__(ApiManager)
+    older.__dict__.update(manager.__dict__, retrieve=HelperApiRetriever(older))
+    del older.max_workers, older.columnar
+    older = pickle.loads(pickle.dumps(older))
+
+    assert older.max_workers == 1
+    assert len(older.retrieve_many()) == 5002
+
+def test_columnar_copy(server, tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    config = tmp_path / 'api.yml'
+    make_config(api_name='api-test', api_domain='http://127.0.0.1:%d'%server.server_port, output_path=str(config),
+                endpoints=[{'name': 'daily', 'api': '/v1/states/daily.csv'}])
+    manager = ApiManager(str(config), str(tmp_path), columnar=True)
+    manager.fetch(force=True)
+
+    path = manager.retrieve('daily')
+    feather = manager.endpoints['daily']['columnar']
+    assert os.path.dirname(feather) == os.path.dirname(path) and feather.endswith('.feather')
+    assert os.path.isfile(feather)
+
+    for usecols in [None, ['deaths', 'state'], [0, 2], lambda name: name != 'date']:
+        pd.testing.assert_frame_equal(manager.retrieve('daily', as_dataframe=True, usecols=usecols),
+                                      pd.read_csv(path, usecols=usecols))
+
+    # new content: the copy is rebuilt and the stale one removed
+    monkeypatch.setitem(FILES, '/v1/states/daily.csv', FILES['/v1/states/daily.csv'] + b'S0,2020-02-01,-1\n')
+    manager.fetch(force=True)
+    assert manager.endpoints['daily']['columnar'] != feather
+    assert [name for name in os.listdir(os.path.dirname(path)) if name.endswith('.feather')] \
+        == [os.path.basename(manager.endpoints['daily']['columnar'])]
+    assert manager.retrieve('daily', as_dataframe=True)['deaths'].iloc[-1] == -1
+
+def test_async_fetch_retries_interrupted_transfer(manager, server, tmp_path, monkeypatch):
+    pytest.importorskip('aiohttp')
+    import asyncio
+    from resources.io import AsyncApiManager
+
+    manager.fetch(force=True)
+    path = manager.retrieve('daily')
+    content = FILES['/v1/states/daily.csv'] + b'S0,2020-02-01,-1\n'
+    monkeypatch.setitem(FILES, '/v1/states/daily.csv', content)
+    server.truncate.append('/v1/states/daily.csv')
+    del server.requests[:]
+
+    async_manager = AsyncApiManager(str(tmp_path / 'api.yml'), str(tmp_path), backoff=0, columnar=False)
+    report = asyncio.run(async_manager.fetch(force=True, chunk_size=1024))
+
+    assert report.failed == []
+    assert report['daily']['status'] == 206
+    assert report['daily']['resumed_from'] > 0
+    first, retry = [headers for url, headers in server.requests if url == '/v1/states/daily.csv']
+    assert first.get('If-None-Match') and 'Range' not in first
+    # the retry resumes the new content instead of revalidating the old one
+    assert 'If-None-Match' not in retry and retry['Range'] == 'bytes=%d-'%report['daily']['resumed_from']
+    with open(path, 'rb') as file:
+        assert file.read() == content
+    assert not os.path.exists(path + '.part')
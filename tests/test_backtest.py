@@ -0,0 +1,59 @@
+"""Tests for the rolling-origin backtest."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from resources.modeling.backtest import backtest, rolling_origins
+from resources.modeling.evaluation import STAGED_METRICS
+
+@pytest.fixture
+def dataset():
+    rng = np.random.RandomState(3)
+    index = pd.period_range('2020-06-01', periods=100, freq='D', name='date')
+    frame = pd.DataFrame(rng.normal(size=(100, 2)), index=index, columns=['lag_1', 'lag_7'])
+    frame['deaths'] = frame @ [2., -1.] + np.linspace(0, 3, 100) + rng.normal(scale=.1, size=100)
+    return frame
+
+def expected_scores(dataset, fitted_at, origin, horizon):
+    X, y = dataset[['lag_1', 'lag_7']].to_numpy(), dataset['deaths'].to_numpy()
+    model = LinearRegression().fit(X[:fitted_at + 1], y[:fitted_at + 1])
+    test = slice(origin + 1, origin + 1 + horizon)
+    return {name: metric(y[test], model.predict(X[test])) for name, metric in STAGED_METRICS.items()}
+
+def test_rolling_origins(dataset):
+    index = dataset.index
+    assert rolling_origins(index, '2020-07-01', '2020-07-20', step=7) == list(index[30:51:7])
+    # the last origins have no complete horizon after them
+    origins = rolling_origins(index, '2020-07-01', step=7, horizon=20)
+    assert origins == list(index[30:80:7])
+    assert origins[-1] + 20 <= index[-1]
+    assert rolling_origins(index, '2020-07-01', step=7)[-1] == index[93]
+
+@pytest.mark.parametrize('refit_every', [1, 2, 3])
+def test_backtest_reuses_fits(dataset, refit_every):
+    origins = rolling_origins(dataset.index, '2020-07-01', step=7, horizon=10)
+    results = backtest(LinearRegression(), dataset, 'deaths', origins, horizon=10, refit_every=refit_every)
+
+    assert list(results.index) == origins
+    positions = [dataset.index.get_loc(origin) for origin in origins]
+    assert list(results['n_train']) == [position + 1 for position in positions]
+    assert (results['n_test'] == 10).all()
+    for i, position in enumerate(positions):
+        fitted_at = positions[i - i % refit_every]
+        expected = expected_scores(dataset, fitted_at, position, 10)
+        np.testing.assert_allclose(results.iloc[i][list(expected)].to_numpy(dtype=float), list(expected.values()))
+
+def test_backtest_drops_short_horizons(dataset):
+    origins = list(dataset.index[[60, 85, 95]])
+    results = backtest(LinearRegression(), dataset, 'deaths', origins, horizon=10)
+
+    assert list(results.index) == list(dataset.index[[60, 85]])
+    assert not results.isna().any().any()
+
+def test_backtest_parallel_matches_serial(dataset):
+    origins = rolling_origins(dataset.index, '2020-07-01', step=5, horizon=10)
+    serial = backtest(LinearRegression(), dataset, 'deaths', origins, horizon=10, refit_every=2)
+    pd.testing.assert_frame_equal(backtest(LinearRegression(), dataset, 'deaths', origins, horizon=10,
+                                           refit_every=2, n_jobs=2), serial)
@@ -0,0 +1,44 @@
+"""Tests for the step cache of DataframeTransformer."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from resources.processing import DataframeTransformer, StepCache
+from resources.processing import transformer
+
+STEPS = [('convert_date_to_index', None),
+         ('filling_period_index', None),
+         ('slice_dataframe', dict(start='feb-2020', stop='mar-2020'))]
+
+@pytest.fixture
+def frame():
+    dates = pd.date_range('2020-01-01', '2020-04-30', freq='D')
+    dates = dates[np.arange(len(dates)) % 5 != 0]
+    return pd.DataFrame({'date': dates.strftime('%Y%m%d').astype(int), 'deaths': np.arange(len(dates))})
+
+def test_results_are_reused(frame, tmp_path):
+    expected = DataframeTransformer(STEPS)(frame)
+    DataframeTransformer(STEPS, cache=StepCache(tmp_path))(frame)
+
+    cache = StepCache(tmp_path)
+    pd.testing.assert_frame_equal(DataframeTransformer(STEPS, cache=cache)(frame), expected)
+    assert (cache.hits, cache.misses) == (1, 0)
+
+def test_code_change_invalidates_results(frame, tmp_path, monkeypatch):
+    DataframeTransformer(STEPS, cache=StepCache(tmp_path))(frame)
+
+    # same behaviour, new code, in a helper the filling step calls
+    namespace = {}
+    exec('def missing_period(period_index):\n'
+         '    ordinals = period_index.asi8\n'
+         '    return len(ordinals) > 0 and ordinals[-1] - ordinals[0] + 1 != len(ordinals)\n',
+         vars(transformer), namespace)
+    monkeypatch.setattr(transformer, 'missing_period', namespace['missing_period'])
+
+    cache = StepCache(tmp_path)
+    result = DataframeTransformer(STEPS, cache=cache)(frame)
+
+    # only the date conversion comes from the cache
+    assert (cache.hits, cache.misses) == (1, 2)
+    pd.testing.assert_frame_equal(result, DataframeTransformer(STEPS)(frame))
@@ -0,0 +1,36 @@
+"""Tests for the incremental update of SeriesClusterer."""
+
+import numpy as np
+import pytest
+
+from resources.modeling.clustering import SeriesClusterer
+
+def low_rank_series(n_entities, n_days, rank=3, seed=0):
+    rng = np.random.RandomState(seed)
+    return rng.normal(size=(n_entities, rank)) @ rng.normal(size=(rank, n_days)) + rng.normal(size=n_days)
+
+def clusterer():
+    return SeriesClusterer(n_components=3, k_range=[1, 2], n_init=2, n_jobs=1, random_state=0)
+
+@pytest.mark.parametrize('n_new', [5, 40], ids=['fewer-days-than-entities', 'more-days-than-entities'])
+def test_update_matches_refit(n_new):
+    data = low_rank_series(20, 30 + n_new)
+    updated = clusterer().fit(data[:, :30]).update(data[:, 30:])
+    refit = clusterer().fit(data)
+
+    # the data has rank 3, so nothing is lost by the truncation
+    np.testing.assert_allclose(updated.singular_values_, refit.singular_values_, rtol=1e-8)
+    np.testing.assert_allclose(updated.mean_, refit.mean_, atol=1e-10)
+    np.testing.assert_allclose(updated.explained_variance_ratio_, refit.explained_variance_ratio_, rtol=1e-8)
+    signs = np.sign(np.sum(updated.coefficients_ * refit.coefficients_, axis=0))
+    np.testing.assert_allclose(updated.coefficients_, refit.coefficients_ * signs, atol=1e-8)
+    np.testing.assert_allclose(updated.components_, refit.components_ * signs[:, None], atol=1e-8)
+
+def test_update_keeps_signs():
+    data = low_rank_series(20, 70)
+    fitted = clusterer().fit(data[:, :30])
+    previous = fitted.coefficients_.copy()
+    fitted.update(data[:, 30:])
+
+    assert (np.sum(fitted.coefficients_ * previous, axis=0) > 0).all()
+    assert fitted.components_.shape == (3, 70)
@@ -0,0 +1,52 @@
+"""Tests for the vectorized evaluation of boosting stages."""
+
+import numpy as np
+import pytest
+import sklearn.metrics
+from sklearn.ensemble import AdaBoostRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.tree import DecisionTreeRegressor
+
+from resources.modeling.evaluation import evaluate_stages, relative_error, staged_predictions
+from resources.modeling.inference import compile_linear_boosting
+
+@pytest.fixture
+def data():
+    rng = np.random.RandomState(2)
+    X = rng.normal(size=(50, 3))
+    y = X @ [2., -1., .5] + X[:, 0] * X[:, 1] + 10 + rng.normal(scale=.3, size=50)
+    return X, y
+
+MODELS = {'linear': lambda: AdaBoostRegressor(LinearRegression(), n_estimators=10, random_state=0),
+          'tree': lambda: AdaBoostRegressor(DecisionTreeRegressor(max_depth=2), n_estimators=10, random_state=0)}
+
+def chunk_bytes(model, X, stages):
+    """max_chunk_bytes for chunks of *stages* stages."""
+
+    n_estimators = len(model.estimators_) if compile_linear_boosting(model) is not None else 1
+    return stages * 8 * len(X) * n_estimators
+
+@pytest.mark.parametrize('kind', MODELS)
+@pytest.mark.parametrize('stages', [3, 100])
+def test_staged_predictions_match_staged_predict(data, kind, stages):
+    X, y = data
+    model = MODELS[kind]().fit(X, y)
+    expected = np.stack(list(model.staged_predict(X)))
+
+    chunks = list(staged_predictions(model, X, max_chunk_bytes=chunk_bytes(model, X, stages)))
+    assert [start for start, _ in chunks] == list(range(0, len(expected), stages))
+    np.testing.assert_allclose(np.concatenate([chunk for _, chunk in chunks]), expected, rtol=1e-12, atol=1e-12)
+
+@pytest.mark.parametrize('kind', MODELS)
+def test_evaluate_stages_matches_sklearn(data, kind):
+    X, y = data
+    model = MODELS[kind]().fit(X, y)
+    metrics = ('mean_squared_error', 'mean_absolute_error', 'relative_error', 'r2_score')
+
+    result = evaluate_stages(model, X, y, metrics=metrics, max_chunk_bytes=chunk_bytes(model, X, 3))
+
+    stages = list(model.staged_predict(X))
+    np.testing.assert_array_equal(result['stage'], np.arange(1, len(stages) + 1))
+    for name in metrics:
+        metric = getattr(sklearn.metrics, name, relative_error)
+        np.testing.assert_allclose(result[name], [metric(y, y_pred) for y_pred in stages], rtol=1e-10, err_msg=name)
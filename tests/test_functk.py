@@ -0,0 +1,46 @@
+"""Tests for the functional toolkit and the step binding of DataframeTransformer."""
+
+import sys
+
+import pytest
+
+from resources.processing import DataframeTransformer
+from resources.utils import bind, compose, curry
+
+def scale(x, factor, offset=0):
+    return x * factor + offset
+
+def test_bind():
+    assert bind(scale, factor=2)(4) == 8
+    assert bind(scale, factor=2, offset=1)(4) == 9
+    # a keyword named like bind's own parameter
+    assert bind(lambda df, func: func(df), func=abs)(-3) == 3
+
+def test_bind_validates_arguments():
+    with pytest.raises(TypeError, match="'factor'"):
+        bind(scale, offset=1)
+    with pytest.raises(TypeError, match="'scaling'"):
+        bind(scale, factor=2, scaling=3)
+    with pytest.raises(TypeError, match='exactly one positional argument'):
+        bind(scale, 2)
+
+def test_curry():
+    curried = curry(scale)
+    assert curried(2)(3) == 6
+    assert curried(2, 3, 1) == 7
+    assert curried(x=2)(factor=3) == 6
+    assert curried(2)(3, offset=4) == 10
+
+def test_compose_deep_chain():
+    increment = lambda x: x + 1
+    assert compose(lambda x: x * 2, increment)(1) == 4
+    assert compose()(5) == 5
+    assert compose(*[increment] * (10 * sys.getrecursionlimit()))(0) == 10 * sys.getrecursionlimit()
+
+@pytest.mark.parametrize('step, message',
+                         [(('slice_dataframe', dict(start='apr-2020', stop=None, begin='apr-2020')), "'begin'"),
+                          (('groupby_feature', dict(by='state', agg_func=list)), "'feature'")],
+                         ids=['unknown', 'missing'])
+def test_invalid_step_arguments_fail_at_construction(step, message):
+    with pytest.raises(TypeError, match=f"step '{step[0]}'.*{message}"):
+        DataframeTransformer([('convert_date_to_index', None), step])
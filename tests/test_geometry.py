@@ -0,0 +1,74 @@
+"""Tests for the geometry store and the choropleth helper."""
+
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+import pandas as pd
+import pytest
+
+gpd = pytest.importorskip('geopandas')
+from shapely.geometry import MultiPolygon, Polygon
+
+from resources.io import geometry
+from resources.io.geometry import GeometryStore, load_store
+from resources.plotting import choropleth
+
+@pytest.fixture
+def shapefile(tmp_path):
+    """Two made-up states in lon/lat (NAD83, as the census files), one of
+    them in two parts."""
+
+    states = gpd.GeoDataFrame({'STATEFP': ['01', '02'], 'STUSPS': ['BB', 'AA'], 'NAME': ['Bee', 'Ay']},
+                              geometry=[Polygon([(-100, 40), (-99, 40), (-99, 41), (-100, 41)]),
+                                        MultiPolygon([Polygon([(-90, 30), (-89, 30), (-89, 31)]),
+                                                      Polygon([(-80, 30), (-79, 30), (-79, 31)])])],
+                              crs='EPSG:4269')
+    path = str(tmp_path / 'states.shp')
+    states.to_file(path)
+    return path
+
+@pytest.fixture(autouse=True)
+def no_open_stores(monkeypatch):
+    monkeypatch.setattr(geometry, '_stores', {})
+
+def test_build_and_reopen(shapefile, tmp_path, monkeypatch):
+    directory = str(tmp_path / 'cache')
+    store = GeometryStore.build(shapefile, directory, tolerances=(0, .5))
+    index, paths = store.paths(0)
+
+    assert list(index.index) == ['AA', 'BB']
+    assert list(index['fips']) == ['02', '01']
+    # one closed sub-path per polygon
+    assert [int(np.sum(path.codes == path.MOVETO)) for path in paths] == [2, 1]
+    np.testing.assert_allclose(paths[1].vertices.min(axis=0), [-100, 40])
+
+    # nothing changed: the store is opened without geopandas
+    mtime = (tmp_path / 'cache' / 'states_0.npz').stat().st_mtime_ns
+    monkeypatch.setattr(geometry, 'gpd', None)
+    assert GeometryStore.build(shapefile, directory, tolerances=(0, .5)).tolerances == [0, .5]
+    assert (tmp_path / 'cache' / 'states_0.npz').stat().st_mtime_ns == mtime
+
+def test_load_store_follows_crs(shapefile, tmp_path):
+    directory = str(tmp_path / 'cache')
+    plain = load_store(directory, shapefile, tolerances=(0,))
+    assert load_store(directory, shapefile, tolerances=(0,)) is plain
+    assert plain.crs is None
+
+    projected = load_store(directory, shapefile, tolerances=(0,), crs='EPSG:5070')
+    assert projected.crs == 'EPSG:5070'
+    # Albers coordinates are in meters, far from lon/lat
+    assert np.abs(projected.paths(0)[1][0].vertices).max() > 1e5
+
+    # going back to lon/lat rebuilds the store again
+    assert np.abs(load_store(directory, shapefile, tolerances=(0,)).paths(0)[1][0].vertices).max() <= 100
+
+def test_choropleth(shapefile, tmp_path):
+    store = load_store(str(tmp_path / 'cache'), shapefile, tolerances=(0,), crs='EPSG:5070')
+
+    ax = choropleth(pd.Series({1: 3.}), store=store, tolerance=0, legend=False)
+    collection = ax.collections[0]
+    assert len(collection.get_paths()) == 2
+    # fips given as integers, AA ('02') has no value
+    assert list(np.ma.getmaskarray(collection.get_array())) == [True, False]
+    assert ax.get_xlim()[1] > 1e5
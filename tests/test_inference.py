@@ -0,0 +1,57 @@
+"""Tests for the model server and the compiled linear boosting ensembles."""
+
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import AdaBoostRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.tree import DecisionTreeRegressor
+
+from resources.modeling import inference
+from resources.modeling.inference import ModelServer, compile_linear_boosting, load_model
+
+@pytest.fixture
+def data():
+    rng = np.random.RandomState(1)
+    X = rng.normal(size=(300, 4))
+    y = X @ [1., -2., .5, 0.] + np.abs(X[:, 1]) + rng.normal(scale=.3, size=300)
+    return X, y
+
+@pytest.mark.parametrize('base', [LinearRegression(), Ridge(alpha=10.)], ids=['linear', 'ridge'])
+def test_compiled_boosting_matches_predict(data, base, monkeypatch):
+    X, y = data
+    model = AdaBoostRegressor(base, n_estimators=15, random_state=0).fit(X, y)
+    server = ModelServer(model)
+
+    assert server.compiled is not None and len(server.compiled[2]) == len(model.estimators_)
+    np.testing.assert_allclose(server.predict(X), model.predict(X), rtol=1e-12, atol=1e-12)
+    # batches larger than a chunk are predicted chunk by chunk
+    monkeypatch.setattr(inference, 'CHUNK_ROWS', 64)
+    np.testing.assert_allclose(server.predict(X), model.predict(X), rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(server.predict(X[0]), model.predict(X[:1]), rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(list(server.predict_stream(iter(X), batch_size=7)), model.predict(X),
+                               rtol=1e-12, atol=1e-12)
+
+def test_other_models_use_their_predict(data):
+    X, y = data
+    model = AdaBoostRegressor(DecisionTreeRegressor(max_depth=3), n_estimators=5, random_state=0).fit(X, y)
+
+    assert compile_linear_boosting(model) is None
+    assert compile_linear_boosting(LinearRegression().fit(X, y)) is None
+    np.testing.assert_array_equal(ModelServer(model).predict(X), model.predict(X))
+
+def test_load_model_reloads_changed_files(data, tmp_path):
+    X, y = data
+    path = str(tmp_path / 'model.pkl')
+    joblib.dump(LinearRegression().fit(X, y), path)
+
+    model = load_model(path)
+    assert load_model(path) is model
+    assert isinstance(model.coef_, np.memmap)
+    assert not isinstance(load_model(path, mmap_mode=None).coef_, np.memmap)
+
+    joblib.dump(Ridge().fit(X, y), path)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10**9))
+    assert isinstance(load_model(path), Ridge)
@@ -0,0 +1,72 @@
+"""Tests for the incremental dataset build of make_datasets.py."""
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from resources.io.arrays import open_rows, read_header, write_rows
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def make_datasets(directory, *options):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    command = [sys.executable, os.path.join('scripts', 'make_datasets.py'), '-d', str(directory), *options]
+    process = subprocess.run(command, cwd=ROOT, env=env, check=True, stdout=subprocess.PIPE, universal_newlines=True)
+    arrays = {name: np.load(os.path.join(str(directory), name + '.npy'))
+              for name in ('training_set', 'test_set', 'smoothed')}
+    return arrays, process.stdout
+
+def test_write_rows_appends_in_place(tmp_path):
+    path = str(tmp_path / 'rows.npy')
+    array = np.arange(30, dtype=np.float64).reshape(10, 3)
+    np.save(path, array[:6])
+    header_length = read_header(path)[4]
+
+    assert write_rows(path, array[4:], start=4) == 10
+    np.testing.assert_array_equal(np.load(path), array)
+    assert read_header(path)[4] == header_length
+
+    # rows in the middle are overwritten, later ones are kept
+    write_rows(path, -array[2:3], start=2)
+    np.testing.assert_array_equal(open_rows(path)[1:4], [array[1], -array[2], array[3]])
+
+def test_write_rows_interrupted_keeps_old_header(tmp_path, monkeypatch):
+    path = str(tmp_path / 'rows.npy')
+    array = np.arange(30, dtype=np.float64).reshape(10, 3)
+    np.save(path, array[:6])
+
+    def interrupt(fd):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(os, 'fsync', interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        write_rows(path, array[6:], start=6)
+
+    # the appended rows are not counted yet
+    np.testing.assert_array_equal(open_rows(path), array[:6])
+
+def test_write_rows_fortran_order(tmp_path):
+    path = str(tmp_path / 'rows.npy')
+    array = np.arange(30, dtype=np.float64).reshape(10, 3)
+    np.save(path, np.asfortranarray(array[:5]))
+
+    assert write_rows(path, array[5:], start=5) == 10
+    np.testing.assert_array_equal(np.load(path), array)
+
+@pytest.mark.skipif(not os.path.isfile(os.path.join(ROOT, 'data', 'dataframes', 'us_historical.pkl')),
+                    reason='needs the processed us_historical dataframe')
+def test_incremental_build_matches_full_build(tmp_path):
+    full, incremental = tmp_path / 'full', tmp_path / 'incremental'
+    full.mkdir()
+    incremental.mkdir()
+
+    expected, _ = make_datasets(full, '--stop', 'dec-2020')
+    make_datasets(incremental, '--stop', 'nov-2020')
+    result, output = make_datasets(incremental, '--stop', 'dec-2020', '--incremental')
+
+    assert 'Appended 31 new dates' in output
+    for name, array in expected.items():
+        assert result[name].shape == array.shape, name
+        np.testing.assert_allclose(result[name], array, rtol=1e-6, atol=1e-6, err_msg=name)
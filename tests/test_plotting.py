@@ -0,0 +1,62 @@
+"""Smoke tests for parallelplot."""
+
+import matplotlib
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba
+
+from resources.plotting import parallelplot
+
+@pytest.fixture
+def frame():
+    rng = np.random.RandomState(4)
+    sizes = {'a': 500, 'b': 100, 'c': 2}
+    return pd.DataFrame({'cluster': np.repeat(list(sizes), list(sizes.values())),
+                         'coeff_1': rng.normal(size=602), 'coeff_2': rng.normal(size=602),
+                         'coeff_3': rng.normal(size=602)})
+
+@pytest.fixture(autouse=True)
+def close_figures():
+    yield
+    plt.close('all')
+
+def collections(ax, kind):
+    # the vertical axes of the plot come last, as one more LineCollection
+    return [collection for collection in ax.collections if isinstance(collection, kind)]
+
+def test_records(frame):
+    ax = parallelplot(frame, 'cluster')
+
+    lines, axes = collections(ax, LineCollection)
+    assert len(lines.get_segments()) == len(frame)
+    assert len(axes.get_segments()) == 1
+    np.testing.assert_array_equal(lines.get_segments()[0], [[0, frame['coeff_1'][0]], [1, frame['coeff_2'][0]],
+                                                            [2, frame['coeff_3'][0]]])
+    assert [text.get_text() for text in ax.get_legend().get_texts()] == ['a', 'b', 'c']
+
+def test_max_records_keeps_every_category(frame):
+    ax = parallelplot(frame, 'cluster', max_records=60, random_state=0)
+
+    lines, axes = collections(ax, LineCollection)
+    assert len(lines.get_segments()) == 50 + 10 + 1
+    colors = {tuple(color) for color in lines.get_colors()}
+    assert colors == {to_rgba(color) for color in ('C0', 'C1', 'C2')}
+
+@pytest.mark.parametrize('interval', [False, 'std', 'robust'])
+def test_centroids(frame, interval):
+    ax = parallelplot(frame, 'cluster', centroids=True, interval=interval, alpha=.3)
+
+    lines, axes = collections(ax, LineCollection)
+    means = frame.groupby('cluster').mean().to_numpy()
+    np.testing.assert_allclose([segment[:, 1] for segment in lines.get_segments()], means)
+
+    polygons = collections(ax, PolyCollection)
+    assert len(polygons) == (1 if interval else 0)
+    if interval == 'robust':
+        upper = frame.groupby('cluster').quantile(.95).to_numpy()
+        np.testing.assert_allclose([path.vertices[:3, 1] for path in polygons[0].get_paths()], upper)
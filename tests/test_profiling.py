@@ -0,0 +1,52 @@
+"""Tests for the per-step profiling of DataframeTransformer."""
+
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from resources.processing import DataframeTransformer, JsonLinesSink, LoggerSink, StatsSink, StepCache, StepProfiler
+
+STEPS = [('convert_date_to_index', None),
+         ('select_features', dict(features=['deaths']))]
+
+@pytest.fixture
+def frame():
+    dates = pd.date_range('2020-01-01', '2020-03-31', freq='D')
+    return pd.DataFrame({'date': dates.strftime('%Y%m%d').astype(int), 'deaths': np.arange(len(dates)),
+                         'cases': np.arange(len(dates)) * 10})
+
+def test_one_record_per_step(frame, tmp_path, caplog):
+    stats = StatsSink()
+    profiler = StepProfiler([stats, JsonLinesSink(str(tmp_path / 'steps.jsonl')), LoggerSink()])
+    with caplog.at_level(logging.INFO, logger='resources.processing'):
+        result = DataframeTransformer(STEPS, profiler=profiler)(frame)
+
+    assert list(result.columns) == ['deaths']
+    assert [(record['step'], record['name']) for record in stats.records] == [(0, 'convert_date_to_index'),
+                                                                             (1, 'select_features')]
+    assert [(record['rows_in'], record['columns_in'], record['rows_out'], record['columns_out'])
+            for record in stats.records] == [(91, 3, 91, 2), (91, 2, 91, 1)]
+    assert all(record['wall_time'] >= 0 and record['peak_memory'] >= 0 for record in stats.records)
+
+    with open(str(tmp_path / 'steps.jsonl')) as file:
+        assert [json.loads(line) for line in file] == stats.records
+    assert len(caplog.records) == 2 and 'select_features' in caplog.records[1].getMessage()
+
+    summary = stats.summary()
+    assert list(summary.index) == [(0, 'convert_date_to_index'), (1, 'select_features')]
+    assert list(summary['calls']) == [1, 1]
+
+def test_cache_resume_profiles_remaining_steps(frame, tmp_path):
+    DataframeTransformer(STEPS[:1], cache=StepCache(tmp_path))(frame)
+
+    profiler = StepProfiler(trace_memory=False)
+    result = DataframeTransformer(STEPS, cache=StepCache(tmp_path), profiler=profiler)(frame)
+
+    pd.testing.assert_frame_equal(result, DataframeTransformer(STEPS)(frame))
+    records = profiler.stats.records
+    assert [(record['step'], record['name'], record['rows_in'], record['columns_in'], record['columns_out'])
+            for record in records] == [(1, 'select_features', 91, 2, 1)]
+    assert 'peak_memory' not in records[0]
@@ -0,0 +1,111 @@
+"""Tests for HalvingSearch and the boosting helpers it relies on."""
+
+import json
+
+import numpy as np
+import pytest
+from joblib import Parallel
+from sklearn.ensemble import AdaBoostRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_squared_error
+from sklearn.model_selection import KFold
+
+from resources.modeling import HalvingSearch, truncate_boosting
+from resources.modeling import search
+
+GRID = {'learning_rate': [.1, .5, 1.], 'loss': ['linear', 'square']}
+
+@pytest.fixture
+def data():
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(80, 3))
+    y = X @ [1., -2., .5] + .3 * X[:, 0] ** 2 + rng.normal(scale=.2, size=80)
+    return X, y
+
+def boosting(n_estimators=8):
+    return AdaBoostRegressor(LinearRegression(), n_estimators=n_estimators, random_state=0)
+
+def halving_search(**kwargs):
+    kwargs = dict(dict(cv=KFold(3, shuffle=True, random_state=0), scoring='neg_mean_squared_error',
+                       factor=2, n_jobs=1), **kwargs)
+    return HalvingSearch(boosting(), GRID, **kwargs)
+
+class Joblib10Parallel(Parallel):
+    """Parallel as joblib < 1.4 has it, without unordered generator output."""
+
+    def __init__(self, *args, return_as=None, **kwargs):
+        if return_as is not None:
+            raise TypeError("__init__() got an unexpected keyword argument 'return_as'")
+        super().__init__(*args, **kwargs)
+
+@pytest.fixture
+def count_fits(monkeypatch):
+    calls = []
+    def fit_and_score(key, *args, **kwargs):
+        calls.append(key)
+        return fit_and_score.original(key, *args, **kwargs)
+    fit_and_score.original = search._fit_and_score
+    monkeypatch.setattr(search, '_fit_and_score', fit_and_score)
+    return calls
+
+def search_keys(result):
+    return [search._key(row.candidate, row.resources, split) for row in result.cv_results_.itertuples()
+            for split in range(3)]
+
+@pytest.mark.parametrize('n_estimators', [1, 3, 7])
+def test_truncate_boosting_matches_refit(data, n_estimators):
+    X, y = data
+    model = boosting(8).fit(X, y)
+    truncated = truncate_boosting(model, n_estimators)
+
+    np.testing.assert_allclose(truncated.predict(X), boosting(n_estimators).fit(X, y).predict(X))
+    assert len(model.estimators_) == 8
+
+def test_unordered_without_generator_output(monkeypatch):
+    from math import sqrt
+    from joblib import delayed
+
+    monkeypatch.setattr(search, 'Parallel', Joblib10Parallel)
+    results = list(search._unordered((delayed(sqrt)(i) for i in range(20)), n_jobs=2))
+    assert sorted(results) == [sqrt(i) for i in range(20)]
+
+@pytest.mark.parametrize('parallel', [Parallel, Joblib10Parallel], ids=['joblib', 'joblib<1.4'])
+def test_search_resumes_from_checkpoint(data, tmp_path, monkeypatch, count_fits, parallel):
+    monkeypatch.setattr(search, 'Parallel', parallel)
+    X, y = data
+    checkpoint = str(tmp_path / 'search.json')
+
+    expected = halving_search(checkpoint=checkpoint).fit(X, y)
+    n_fits = len(count_fits)
+    # 3 splits of 6 candidates at 2 estimators, then of 3 at 4 and of 2 at 8
+    assert n_fits == 3 * (6 + 3 + 2)
+
+    # an interrupted search: the last fits were never saved
+    with open(checkpoint) as file:
+        state = json.load(file)
+    for key in count_fits[-4:]:
+        del state['scores'][key]
+    with open(checkpoint, 'w') as file:
+        json.dump(state, file)
+
+    del count_fits[:]
+    resumed = halving_search(checkpoint=checkpoint).fit(X, y)
+    assert sorted(count_fits) == sorted(key for key in search_keys(expected) if key not in state['scores'])
+    assert len(count_fits) == 4
+    assert resumed.best_params_ == expected.best_params_
+    assert resumed.cv_results_.equals(expected.cv_results_)
+
+    # another search does not reuse the scores
+    del count_fits[:]
+    halving_search(checkpoint=checkpoint, factor=3).fit(X, y)
+    assert len(count_fits) > 4
+
+def test_staged_search_truncates_best_estimator(data):
+    X, y = data
+    result = halving_search(factor=None, staged_metric=mean_squared_error).fit(X, y)
+
+    assert len(result.cv_results_) == 6
+    assert 1 <= result.best_resources_ <= 8
+    assert result.best_estimator_.n_estimators == result.best_resources_
+    refit = boosting(result.best_resources_).set_params(**result.best_params_).fit(X, y)
+    np.testing.assert_allclose(result.best_estimator_.predict(X), refit.predict(X))
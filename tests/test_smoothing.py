@@ -0,0 +1,86 @@
+"""Tests for the parallel STL engine."""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from resources.processing import smoothing
+from resources.processing.smoothing import SharedBuffer, best_stl_params, stl_many, stl_search
+
+STL = pytest.importorskip('statsmodels.tsa.seasonal').STL
+
+@pytest.fixture
+def series():
+    rng = np.random.RandomState(0)
+    return [np.sin(np.arange(n) * 2 * np.pi / 7) + np.linspace(0, scale, n) + rng.normal(size=n)
+            for n, scale in [(60, 1.), (45, 10.), (90, 3.), (30, 0.)]]
+
+@pytest.fixture(params=['shared_memory', 'memmap'])
+def buffer_kind(request, monkeypatch):
+    if request.param == 'shared_memory':
+        if smoothing.shared_memory is None:
+            pytest.skip('needs multiprocessing.shared_memory (Python 3.8+)')
+    else:
+        # the Python < 3.8 path; workers are forked, so they see the patched module too
+        monkeypatch.setattr(smoothing, 'shared_memory', None)
+    return request.param
+
+@pytest.mark.parametrize('component', ['trend', 'resid'])
+def test_stl_many_matches_serial_fits(series, buffer_kind, component):
+    parallel = stl_many(series, period=7, seasonal=5, n_jobs=2, component=component)
+    serial = stl_many(series, period=7, seasonal=5, n_jobs=1, component=component)
+
+    assert [len(values) for values in parallel] == [len(values) for values in series]
+    for values, result, expected in zip(series, parallel, serial):
+        np.testing.assert_array_equal(result, expected)
+        np.testing.assert_allclose(result, getattr(STL(values, period=7, seasonal=5).fit(), component))
+
+def test_shared_buffer_is_released(buffer_kind):
+    with SharedBuffer(10) as buffer:
+        buffer.array[:] = np.arange(10)
+        handle, view = SharedBuffer.attach(buffer.name, (2, 5))
+        np.testing.assert_array_equal(view, np.arange(10).reshape(2, 5))
+        del view
+        if handle is not None:
+            handle.close()
+        name = buffer.name
+
+    if buffer_kind == 'memmap':
+        assert not os.path.exists(name)
+    else:
+        with pytest.raises(FileNotFoundError):
+            smoothing.shared_memory.SharedMemory(name=name)
+
+def test_stl_search_scores_every_combination(series):
+    results = stl_search(series, periods=[7, 14], seasonals=[2, 1, 5, 7], robust=(False, True), n_jobs=1)
+
+    # even and too short seasonal windows are dropped
+    assert len(results) == 2 * 2 * 2
+    assert set(results['seasonal']) == {5, 7}
+    assert results['resid_var'].is_monotonic_increasing
+
+    for row in results.itertuples():
+        scores = []
+        for values in series:
+            fit = STL(values, period=row.period, seasonal=row.seasonal, robust=row.robust).fit()
+            scale = np.var(values)
+            scores.append((np.var(fit.resid) / scale, np.mean(np.diff(fit.trend, 2) ** 2) / scale))
+        resid_var, roughness = np.array(scores).T
+        np.testing.assert_allclose([row.resid_var, row.max_resid_var, row.roughness, row.max_roughness],
+                                   [resid_var.mean(), resid_var.max(), roughness.mean(), roughness.max()])
+
+def test_stl_search_parallel_matches_serial(series, buffer_kind):
+    serial = stl_search(series, periods=[7], seasonals=[3, 5, 9], n_jobs=1)
+    pd.testing.assert_frame_equal(stl_search(series, periods=[7], seasonals=[3, 5, 9], n_jobs=2), serial)
+
+def test_best_stl_params(series):
+    results = stl_search(series, periods=[7], seasonals=[3, 5, 9], n_jobs=1)
+
+    best = results.iloc[0]
+    assert best_stl_params(results) == dict(period=7, seasonal=int(best['seasonal']), robust=False)
+    smoothest = results.loc[results['roughness'].idxmin()]
+    assert best_stl_params(results, max_roughness=smoothest['roughness'])['seasonal'] == smoothest['seasonal']
+    with pytest.raises(AssertionError, match='roughness bound'):
+        best_stl_params(results, max_roughness=-1)
@@ -0,0 +1,82 @@
+"""Equivalence tests for the grouped and lazy modes of DataframeTransformer."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from resources.processing import DataframeTransformer
+
+STATES = ['AK', 'NY', 'TX', 'WY']
+
+@pytest.fixture
+def states_frame():
+    """Long frame of daily records of several states as the covid-tracking
+    API serves them: yyyymmdd integer dates, newest first, with missing days
+    (none at all for WY before september)."""
+
+    rng = np.random.default_rng(7)
+    frames = []
+    for state in STATES:
+        dates = pd.date_range('2020-03-01', '2020-12-31', freq='D')
+        dates = dates[rng.random(len(dates)) > .1]
+        if state == 'WY':
+            dates = dates[dates >= '2020-09-01']
+        frames.append(pd.DataFrame({'date': dates.strftime('%Y%m%d').astype(int),
+                                    'state': state,
+                                    'deathIncrease': rng.integers(0, 100, len(dates)),
+                                    'positiveIncrease': rng.normal(1000, 100, len(dates))}))
+    return pd.concat(frames, ignore_index=True).sort_values('date', ascending=False, kind='stable',
+                                                            ignore_index=True)
+
+ROW_STEPS = [('convert_date_to_index', None),
+             ('filling_period_index', None),
+             ('select_features', dict(features=['deathIncrease', 'positiveIncrease'])),
+             ('slice_dataframe', dict(start='jun-2020', stop='nov-2020'))]
+
+MATRIX_STEPS = [('convert_date_to_index', None),
+                ('filling_period_index', None),
+                ('slice_dataframe', dict(start='apr-2020', stop='nov-2020')),
+                ('select_features', dict(features=['state', 'deathIncrease'])),
+                ('groupby_feature', dict(by='state', feature='deathIncrease', agg_func=np.array))]
+
+def test_grouped_matches_per_entity(states_frame):
+    pipeline = DataframeTransformer(ROW_STEPS)
+    grouped = pipeline(states_frame, by='state')
+
+    assert list(grouped['state'].unique()) == STATES
+    for state in STATES:
+        expected = pipeline(states_frame[states_frame['state'] == state].drop(columns='state'))
+        result = grouped[grouped['state'] == state].drop(columns='state')
+        pd.testing.assert_frame_equal(result, expected)
+
+def test_grouped_matrix_matches_per_entity(states_frame):
+    matrix = DataframeTransformer(MATRIX_STEPS)(states_frame, by='state')
+    rows = DataframeTransformer(MATRIX_STEPS[:-1])
+
+    assert list(matrix.index) == STATES
+    for state in STATES:
+        series = rows(states_frame[states_frame['state'] == state])['deathIncrease']
+        row = matrix.loc[state]
+        np.testing.assert_array_equal(row[series.index].to_numpy(), series.to_numpy(dtype=float))
+        assert row.drop(series.index).isna().all()
+
+@pytest.mark.parametrize('steps, by', [(ROW_STEPS, None), (MATRIX_STEPS[:-1], None),
+                                      (ROW_STEPS, 'state'), (MATRIX_STEPS, 'state')],
+                         ids=['rows', 'matrix-rows', 'grouped-rows', 'grouped-matrix'])
+def test_lazy_matches_eager(states_frame, steps, by):
+    df = states_frame if by is not None else states_frame[states_frame['state'] == 'WY']
+    eager = DataframeTransformer(steps)(df, by=by)
+
+    pipeline = DataframeTransformer(steps, lazy=True)
+    assert [name for name, _ in pipeline.plan][:2] == ['select_features', 'convert_date_to_index']
+    assert 'filling_period_window' in [name for name, _ in pipeline.plan]
+
+    # the lazy plan only needs the columns it reports
+    columns = pipeline.required_columns(by=by)
+    pd.testing.assert_frame_equal(pipeline(df[columns], by=by), eager)
+
+def test_string_dates_match_integer_dates(states_frame):
+    as_strings = states_frame.assign(date=pd.to_datetime(states_frame['date'].astype(str)).dt.strftime('%m/%d/%Y'))
+    pipeline = DataframeTransformer(ROW_STEPS)
+
+    pd.testing.assert_frame_equal(pipeline(as_strings, by='state'), pipeline(states_frame, by='state'))